@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of rbwm's main flows against stand-in tools.
+
+Puts fake `rbw`, menu, key-sending and clipboard tools (bench/fakes.py) on
+PATH, serves synthetic vaults of several sizes, and times `main()` for
+autofill, Details, Notes, Add, Edit (notes, then username), Remove,
+removing or moving ten entries picked in one multi-select, and `--query`
+launches with one match (no menu) and with three. Each run reports wall time,
+the number of processes rbwm spawned, the tool invocations behind them
+and rbwm's peak RSS. What got typed is checked against the expected
+keystrokes, so a run that silently does the wrong thing fails.
+
+Runs offline on a plain Linux box; no X or Wayland session is needed.
+
+    python bench/e2e.py [--sizes 100,10000,100000] [--runs N]
+                        [--scenarios autofill,details,...] [--cold]
+                        [--menu dmenu|rofi|fuzzel] [--wayland]
+
+By default the listing cache is warm, as it is for most launches; --cold
+clears it before every run. The fakes are Python scripts, so every tool
+spawn costs an interpreter start (~10 ms) that the real tools do not.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+BENCH = Path(__file__).resolve().parent
+ROOT = BENCH.parent
+sys.path.insert(0, str(BENCH))
+
+sys.path.insert(0, str(ROOT))
+
+import fakes  # noqa: E402
+from rbwm.menu import DONE, MENU_CONFIGS, SELECT_SEVERAL  # noqa: E402
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+
+# rbw commands a scenario may or may not run (get also prefetches likely picks)
+UNCHECKED_RBW = {"unlocked", "list", "get", "code"}
+
+# Runs main() in the rbwm process and reports time, spawns and peak RSS
+DRIVER = """
+import json, os, resource, subprocess, sys, time
+spawns = []
+_init = subprocess.Popen.__init__
+def _counting_init(self, args, *a, **kw):
+    spawns.append(args if isinstance(args, str) else " ".join(map(str, args)))
+    _init(self, args, *a, **kw)
+subprocess.Popen.__init__ = _counting_init
+sys.argv = ["rbwm"] + sys.argv[1:]
+start = time.perf_counter()
+from rbwm.__main__ import main
+main()
+elapsed = time.perf_counter() - start
+with open(os.environ["BENCH_RESULT"], "w") as f:
+    json.dump({"seconds": elapsed, "spawns": spawns,
+               "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}, f)
+"""
+
+
+def login(i):
+    item = fakes.vault_item(i)
+    return item["name"], item["user"], f"pw-{i:06d}-secret"
+
+
+def pick_login(size):
+    """A login from the middle of the vault."""
+    i = size // 2
+    return i + 1 if i % fakes.NOTE_EVERY == 0 else i
+
+
+def logins(start, n):
+    """Indices of n logins from start on."""
+    return [j for j in range(start, start + n + n // fakes.NOTE_EVERY + 1) if j % fakes.NOTE_EVERY][:n]
+
+
+def display(i):
+    item = fakes.vault_item(i)
+    text = item["name"]
+    if item["user"]:
+        text += f" ({item['user']})"
+    if item["folder"]:
+        text += f" [{item['folder']}]"
+    return text
+
+
+def pick_many(items, menu):
+    """Picks that select several items, by multi-select or rbwm's fallback."""
+    if "multi_cmd" in MENU_CONFIGS.get(menu, {}):
+        return ["\t".join(items)]
+    return [SELECT_SEVERAL] + list(items) + ["~" + DONE]
+
+
+def scenarios(size, menu="dmenu"):
+    """name -> (menu picks, expected typed keystrokes or None, rbw commands that must run)."""
+    i = pick_login(size)
+    several = pick_many([display(j) for j in logins(i, 10)], menu)
+    name, user, password = login(i)
+    # The three Bench logins among ten consecutive names
+    group = i // 10 * 10
+    bench = next(j for j in range(group + 1, group + 10) if j % 3 == 0)
+    _, bench_user, bench_password = login(bench)
+    note = (size // 2) // fakes.NOTE_EVERY * fakes.NOTE_EVERY
+    return {
+        "autofill": ([display(i)],
+                     [{"text": user}, {"key": "Tab"}, {"text": password}, {"key": "Return"}],
+                     {"get"}),
+        "details": (["[Details]", display(i), "password"],
+                    [{"text": password}],
+                    {"get"}),
+        "notes": (["[Notes]", display(note)],
+                  [{"text": f"Secure note {note}\nwith two lines"}],
+                  {"get"}),
+        "add": (["[Add]", "~name:", "bench-new", "~username:", "bench-user", "[Save]"],
+                None,
+                {"add"}),
+        "edit": (["[Edit]", display(i), "~notes:", "edited note", "[Save]"],
+                 None,
+                 {"get", "edit"}),
+        "edit-user": (["[Edit]", display(i), "~username:", "renamed-user", "[Save]"],
+                      None,
+                      {"get", "remove", "add"}),
+        "remove": (["[Remove]", display(i)],
+                   None,
+                   {"remove"}),
+        "remove-10": (["[Remove]"] + several + ["Yes"],
+                      None,
+                      {"remove"}),
+        "move-10": (["[Move]"] + several + ["Archive", "Yes"],
+                    None,
+                    {"get", "remove", "add"}),
+        "query": ([],
+                  [{"text": user}, {"key": "Tab"}, {"text": password}, {"key": "Return"}],
+                  {"get"}),
+        "query-3": ([display(bench)],
+                    [{"text": bench_user}, {"key": "Tab"}, {"text": bench_password}, {"key": "Return"}],
+                    {"get"}),
+    }
+
+
+def scenario_args(size):
+    """name -> rbwm command-line arguments, for scenarios that take any."""
+    name = login(pick_login(size))[0]
+    return {
+        "query": ["--query", name],
+        "query-3": ["--folder", "Bench", "--query", name[:-1]],
+    }
+
+
+def make_env(tmp, size, args):
+    """Build an isolated environment with the fakes on PATH and a vault of `size` entries."""
+    tmp = Path(tmp)
+    bin_dir = tmp / "bin"
+    bin_dir.mkdir()
+    for name in fakes.TOOLS:
+        path = bin_dir / name
+        path.write_text(
+            f"#!{sys.executable} -S\n"
+            f"import sys\nsys.path.insert(0, {str(BENCH)!r})\n"
+            f"from fakes import main\nmain({name!r})\n"
+        )
+        path.chmod(0o755)
+    
+    listing = tmp / "listing.json"
+    fakes.write_listing(listing, size)
+    # rbw's database, which the listing cache is keyed on
+    (tmp / "cache" / "rbw").mkdir(parents=True)
+    (tmp / "cache" / "rbw" / "bench@example.com.json").write_text("{}")
+    
+    config_dir = tmp / "config" / "rbwm"
+    config_dir.mkdir(parents=True)
+    (config_dir / "config").write_text(
+        f"MENU_CMD={args.menu}\nPINENTRY_CMD={args.menu}\nCLIPBOARD_RESTORE_DELAY=0\n"
+    )
+    (tmp / "clipboard").mkdir()
+    runtime = tmp / "run"
+    runtime.mkdir(mode=0o700)
+    
+    env = {
+        "PATH": f"{bin_dir}{os.pathsep}/usr/bin{os.pathsep}/bin",
+        "HOME": str(tmp),
+        "XDG_CONFIG_HOME": str(tmp / "config"),
+        "XDG_CACHE_HOME": str(tmp / "cache"),
+        "XDG_STATE_HOME": str(tmp / "state"),
+        "XDG_RUNTIME_DIR": str(runtime),
+        "PYTHONPATH": str(ROOT),
+        "BENCH_LOG": str(tmp / "log.jsonl"),
+        "BENCH_PICKS": str(tmp / "picks"),
+        "BENCH_RESULT": str(tmp / "result.json"),
+        "BENCH_LISTING": str(listing),
+        "BENCH_VAULT_SIZE": str(size),
+        "BENCH_CLIPBOARD": str(tmp / "clipboard"),
+    }
+    if args.wayland:
+        env["WAYLAND_DISPLAY"] = "bench-0"
+    else:
+        env["DISPLAY"] = ":bench"
+    return env
+
+
+def run_rbwm(env, picks, argv=()):
+    """Run main() once with the given menu picks and arguments; returns (result, tool log)."""
+    Path(env["BENCH_PICKS"]).write_text("".join(p + "\n" for p in picks))
+    log = Path(env["BENCH_LOG"])
+    log.write_text("")
+    proc = subprocess.run([sys.executable, "-c", DRIVER, *argv], env=env, cwd=env["HOME"],
+                          stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"rbwm exited with {proc.returncode}:\n{proc.stderr}")
+    result = json.loads(Path(env["BENCH_RESULT"]).read_text())
+    # Let the detached clipboard-restore helpers finish logging
+    time.sleep(0.05)
+    events = [json.loads(line) for line in log.read_text().splitlines()]
+    return result, events
+
+
+def check(name, events, expected_typed, expected_rbw):
+    """Return a list of problems with what a run typed and ran."""
+    problems = []
+    typed = [key for e in events for key in e.get("typed", ())]
+    if expected_typed is not None and typed != expected_typed:
+        problems.append(f"{name}: typed {typed!r}, expected {expected_typed!r}")
+    if expected_typed is None and typed:
+        problems.append(f"{name}: unexpectedly typed {typed!r}")
+    ran = {e["args"][0] for e in events if e["tool"] == "rbw" and e["args"]}
+    for cmd in sorted(expected_rbw - ran):
+        problems.append(f"{name}: rbw {cmd} never ran")
+    for cmd in sorted(ran - expected_rbw - UNCHECKED_RBW):
+        problems.append(f"{name}: rbw {cmd} ran unexpectedly")
+    edits = [e for e in events if e["tool"] == "editor"]
+    if "edit" in expected_rbw and not (edits and edits[-1]["password"]):
+        problems.append(f"{name}: rbw edit did not receive the entry's password")
+    return problems
+
+
+def bench_size(size, args):
+    rows = []
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="rbwm-bench-") as tmp:
+        env = make_env(tmp, size, args)
+        cache_dir = Path(env["XDG_CACHE_HOME"]) / "rbwm"
+        argvs = scenario_args(size)
+        for name, (picks, expected_typed, expected_rbw) in scenarios(size, args.menu).items():
+            if name not in args.scenarios:
+                continue
+            times = []
+            for _ in range(args.runs):
+                if args.cold:
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                else:
+                    # Cancelled launch: fills the listing cache and tool discovery
+                    run_rbwm(env, [])
+                result, events = run_rbwm(env, picks, argvs.get(name, ()))
+                times.append(result["seconds"])
+                problems += check(name, events, expected_typed, expected_rbw)
+            tools = Counter(e["tool"] for e in events)
+            rows.append({
+                "size": size,
+                "scenario": name,
+                "ms": min(times) * 1000,
+                "spawns": len(result["spawns"]),
+                "tools": dict(tools),
+                "maxrss_mb": result["maxrss_kb"] / 1024,
+            })
+    return rows, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated vault sizes")
+    parser.add_argument("--runs", type=int, default=3, help="take the best of N runs")
+    parser.add_argument("--scenarios", default=",".join(scenarios(100)),
+                        help="comma-separated scenarios to run")
+    parser.add_argument("--cold", action="store_true", help="clear the listing cache before every run")
+    parser.add_argument("--menu", default="dmenu", choices=fakes.MENUS, help="menu program to stand in for")
+    parser.add_argument("--wayland", action="store_true", help="use the Wayland injector instead of X11")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args()
+    args.scenarios = set(args.scenarios.split(","))
+    
+    problems = []
+    if not args.json:
+        print(f"{'size':>7}  {'scenario':<9} {'time':>9} {'spawns':>6} {'peak RSS':>9}  tools")
+    for size in (int(s) for s in args.sizes.split(",")):
+        rows, size_problems = bench_size(size, args)
+        problems += [f"[{size}] {p}" for p in size_problems]
+        for row in rows:
+            if args.json:
+                print(json.dumps(row))
+                continue
+            tools = " ".join(f"{tool}={n}" for tool, n in sorted(row["tools"].items()))
+            print(f"{row['size']:>7}  {row['scenario']:<9} {row['ms']:>6.1f} ms {row['spawns']:>6} "
+                  f"{row['maxrss_mb']:>6.1f} MB  {tools}")
+    
+    for problem in problems:
+        print(f"FAIL: {problem}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
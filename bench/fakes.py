@@ -0,0 +1,252 @@
+"""
+Stand-in `rbw`, menu and injector tools for the end-to-end benchmark.
+
+bench/e2e.py installs one small launcher per tool name that calls
+`main(name)`. Every invocation appends a JSON line to $BENCH_LOG, which is
+how the harness counts spawns and reads back what was typed.
+
+- rbw serves a synthetic vault of $BENCH_VAULT_SIZE entries: every tenth
+  is a secure note named noteNNNNNN, the rest are logins siteNNNNNN for
+  userNNNNNN. `list --raw` streams the listing pre-rendered at
+  $BENCH_LISTING; `get` synthesizes the record from the name or ID.
+- Menus (dmenu, rofi, fuzzel, ...) read their items and answer with the
+  next pick from $BENCH_PICKS, one per line: an item or typed text,
+  `~prefix` for the first item starting with prefix, or several of these
+  separated by tabs for a multi-select. No picks left cancels the menu.
+- Clipboard tools keep the selections in files under $BENCH_CLIPBOARD, and
+  key senders log each key, with Shift+Insert logged as the pasted text.
+"""
+import json
+import os
+import sys
+
+NOTE_EVERY = 10
+# Entry i has the ID f"{ID_PREFIX}{i:012d}"
+ID_PREFIX = "00000000-0000-4000-8000-"
+
+
+def log(tool, **fields):
+    with open(os.environ["BENCH_LOG"], "a") as f:
+        f.write(json.dumps({"tool": tool, **fields}) + "\n")
+
+
+def vault_item(i):
+    """Non-secret listing record for entry i."""
+    if i % NOTE_EVERY == 0:
+        return {"id": f"{ID_PREFIX}{i:012d}", "name": f"note{i:06d}",
+                "user": None, "folder": "Notes", "type": "Note", "uris": []}
+    return {"id": f"{ID_PREFIX}{i:012d}", "name": f"site{i:06d}",
+            "user": f"user{i:06d}", "folder": "Bench" if i % 3 == 0 else None,
+            "type": "Login", "uris": [f"https://login.site{i:06d}.example.com/"]}
+
+
+def write_listing(path, size):
+    """Pre-render `rbw list --raw` output for a vault of the given size."""
+    with open(path, "w") as f:
+        f.write("[")
+        for i in range(size):
+            if i:
+                f.write(",")
+            f.write(json.dumps(vault_item(i)))
+        f.write("]\n")
+
+
+def _lookup(args):
+    """The vault index named by an rbw command's arguments, or None."""
+    args = [a for a in args if not a.startswith("-")]
+    name = args[0] if args else ""
+    prefix = ID_PREFIX if name.startswith(ID_PREFIX) else name[:4]
+    try:
+        i = int(name[len(prefix):])
+    except ValueError:
+        return None
+    if prefix not in (ID_PREFIX, "site", "note") or not 0 <= i < int(os.environ["BENCH_VAULT_SIZE"]):
+        return None
+    return i
+
+
+def _secrets(i):
+    """(password, notes) of entry i."""
+    if vault_item(i)["type"] == "Note":
+        return None, f"Secure note {i}\nwith two lines"
+    return f"pw-{i:06d}-secret", None
+
+
+def _rbw_get(args):
+    i = _lookup(args)
+    if i is None:
+        return 1
+    item = vault_item(i)
+    password, notes = _secrets(i)
+    data = None
+    if password is not None:
+        data = {"username": item["user"], "password": password,
+                "totp": "JBSWY3DPEHPK3PXP" if i % 7 == 0 else None,
+                "uris": [{"uri": item["uris"][0], "match_type": None}]}
+    print(json.dumps({"id": item["id"], "folder": item["folder"], "name": item["name"],
+                      "data": data, "fields": [], "notes": notes, "history": []}))
+    return 0
+
+
+def _rbw_edit(args):
+    """Run $EDITOR on the entry's password and notes, as rbw edit does."""
+    import shlex
+    import subprocess
+    import tempfile
+    
+    i = _lookup(args)
+    if i is None:
+        return 1
+    password, notes = _secrets(i)
+    with tempfile.NamedTemporaryFile("w+", suffix=".txt") as f:
+        f.write(f"{password or ''}\n" + (f"\n{notes}\n" if notes else ""))
+        f.flush()
+        # Like rbw, leave inherited descriptors open for the editor
+        editor = subprocess.run(shlex.split(os.environ["EDITOR"]) + [f.name], close_fds=False)
+        if editor.returncode != 0:
+            return 1
+        f.seek(0)
+        lines = f.read().split("\n")
+    log("editor", password=lines[0], notes="\n".join(lines[1:]).strip("\n"))
+    return 0
+
+
+def rbw(args):
+    cmd = args[0] if args else ""
+    if cmd == "list":
+        with open(os.environ["BENCH_LISTING"], "rb") as f:
+            while chunk := f.read(65536):
+                sys.stdout.buffer.write(chunk)
+        return 0
+    if cmd == "get":
+        return _rbw_get(args[1:])
+    if cmd == "code":
+        print("123456")
+        return 0
+    if cmd == "edit":
+        return _rbw_edit(args[1:])
+    if cmd == "add":
+        sys.stdin.read()
+    # unlocked, unlock, lock, sync, add and remove all just succeed
+    return 0
+
+
+def _next_pick():
+    path = os.environ["BENCH_PICKS"]
+    with open(path) as f:
+        picks = f.read().splitlines()
+    if not picks:
+        return None
+    with open(path, "w") as f:
+        f.write("".join(p + "\n" for p in picks[1:]))
+    return picks[0]
+
+
+def menu(name, args):
+    items = sys.stdin.read().splitlines()
+    pick = _next_pick()
+    picks = []
+    # Tab-separated picks are several items marked in one multi-select pass
+    for part in pick.split("\t") if pick is not None else []:
+        if part.startswith("~"):
+            part = next((item for item in items if item.startswith(part[1:])), None)
+            if part is None:
+                picks = []
+                break
+        picks.append(part)
+    log(name, items=len(items), pick=picks)
+    if not picks:
+        return 1
+    print("\n".join(picks))
+    return 0
+
+
+def _selection_file(name):
+    return os.path.join(os.environ["BENCH_CLIPBOARD"], name)
+
+
+def _read_selection(name):
+    try:
+        with open(_selection_file(name)) as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def _write_selection(name, text):
+    with open(_selection_file(name), "w") as f:
+        f.write(text)
+
+
+def clipboard(name, args):
+    primary = "-p" in args or "primary" in args or "--primary" in args
+    selection = "primary" if primary else "clipboard"
+    if name == "wl-paste" or "-o" in args:
+        sys.stdout.write(_read_selection(selection))
+        log(name, read=selection)
+    else:
+        _write_selection(selection, sys.stdin.read())
+        log(name, write=selection)
+    return 0
+
+
+def _typed(keys):
+    """Expand a key list, replacing Shift+Insert with the pasted text."""
+    return [{"text": _read_selection("primary")} if key == "shift+Insert" else {"key": key}
+            for key in keys]
+
+
+def xdotool(args):
+    cmd = args[0] if args else ""
+    if cmd == "getactivewindow":
+        print(os.environ.get("BENCH_WINDOW_TITLE", "Terminal"))
+    elif cmd == "key":
+        log("xdotool", typed=_typed(args[1:]))
+        return 0
+    elif cmd == "type":
+        log("xdotool", typed=[{"text": sys.stdin.read()}])
+        return 0
+    log("xdotool")
+    return 0
+
+
+def wtype(args):
+    keys = []
+    shift = False
+    it = iter(args)
+    for arg in it:
+        if arg == "-M":
+            shift = next(it, "") == "shift"
+        elif arg == "-m":
+            next(it, None)
+            shift = False
+        elif arg == "-k":
+            key = next(it, "")
+            keys.append("shift+" + key if shift else key)
+        elif arg == "-":
+            log("wtype", typed=[{"text": sys.stdin.read()}])
+            return 0
+    log("wtype", typed=_typed(keys))
+    return 0
+
+
+MENUS = ("dmenu", "bemenu", "wmenu", "rofi", "fuzzel", "tofi")
+CLIPBOARDS = ("xclip", "xsel", "wl-copy", "wl-paste")
+TOOLS = ("rbw", "xdotool", "wtype") + MENUS + CLIPBOARDS
+
+
+def main(name):
+    args = sys.argv[1:]
+    if name == "rbw":
+        log("rbw", args=args[:1])
+        status = rbw(args)
+    elif name in MENUS:
+        status = menu(name, args)
+    elif name in CLIPBOARDS:
+        status = clipboard(name, args)
+    elif name == "xdotool":
+        status = xdotool(args)
+    else:
+        status = wtype(args)
+    sys.stdout.flush()
+    sys.exit(status)
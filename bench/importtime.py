@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for rbwm's startup path.
+
+Runs `python -X importtime -m rbwm` in a stub environment (an `rbw` that
+reports a locked vault and refuses to unlock, and a menu that is
+cancelled), so the run covers every import up to the first menu, then sums
+the cumulative time of imports the bare interpreter does not already make.
+Exits non-zero if the best of several runs exceeds the budget.
+
+    python bench/importtime.py [--budget MS] [--runs N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BUDGET_MS = 60.0
+
+STUBS = {
+    "rbw": "#!/bin/sh\nexit 1\n",
+    "dmenu": "#!/bin/sh\ncat >/dev/null\nexit 1\n",
+}
+
+
+def make_env(tmp):
+    """Build an isolated environment with stub tools and a minimal config."""
+    tmp = Path(tmp)
+    bin_dir = tmp / "bin"
+    bin_dir.mkdir()
+    for name, script in STUBS.items():
+        path = bin_dir / name
+        path.write_text(script)
+        path.chmod(0o755)
+    config_dir = tmp / "config" / "rbwm"
+    config_dir.mkdir(parents=True)
+    (config_dir / "config").write_text("MENU_CMD=dmenu\nPINENTRY_CMD=dmenu\n")
+    runtime = tmp / "run"
+    runtime.mkdir(mode=0o700)
+    
+    env = {
+        "PATH": f"{bin_dir}{os.pathsep}/usr/bin{os.pathsep}/bin",
+        "HOME": str(tmp),
+        "XDG_CONFIG_HOME": str(tmp / "config"),
+        "XDG_CACHE_HOME": str(tmp / "cache"),
+        "XDG_STATE_HOME": str(tmp / "state"),
+        "XDG_RUNTIME_DIR": str(runtime),
+        "PYTHONPATH": str(ROOT),
+        "PYTHONDONTWRITEBYTECODE": "",
+    }
+    return env
+
+
+def parse_importtime(stderr):
+    """Map top-level imported module -> cumulative microseconds."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.startswith("   "):
+            continue  # Nested import, already counted in its parent
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(env):
+    baseline = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"],
+        env=env, capture_output=True, text=True
+    )
+    run = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "rbwm"],
+        env=env, capture_output=True, text=True, cwd=env["HOME"]
+    )
+    startup = set(parse_importtime(baseline.stderr))
+    return {name: us for name, us in parse_importtime(run.stderr).items() if name not in startup}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS, help="budget in milliseconds")
+    parser.add_argument("--runs", type=int, default=5, help="take the best of N runs")
+    args = parser.parse_args()
+    
+    best = None
+    with tempfile.TemporaryDirectory() as tmp:
+        env = make_env(tmp)
+        # Warm up the bytecode cache so compilation isn't measured
+        measure(env)
+        for _ in range(args.runs):
+            times = measure(env)
+            if best is None or sum(times.values()) < sum(best.values()):
+                best = times
+    
+    total_ms = sum(best.values()) / 1000
+    print(f"rbwm startup imports: {total_ms:.1f} ms (budget {args.budget:.1f} ms)")
+    for name, us in sorted(best.items(), key=lambda item: item[1], reverse=True)[:10]:
+        print(f"  {us / 1000:7.2f} ms  {name}")
+    if total_ms > args.budget:
+        print("FAIL: import-time budget exceeded", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
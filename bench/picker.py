@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Keystroke latency of the builtin picker's search (rbwm/picker.py).
+
+Types a few queries one key at a time, with backspaces, against synthetic
+vault listings and drives each search the way the picker's input loop
+does. For every keystroke it reports how long the picker is busy before
+it can read the next key (one search slice plus the lookup), how long
+until the first screenful of matches is known, and how long until the
+search has scored every candidate. Exits non-zero if any keystroke keeps
+the picker busy for longer than a frame.
+
+    python bench/picker.py [--sizes 1000,10000,100000] [--rows 40] [--frame MS]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH))
+sys.path.insert(0, str(BENCH.parent))
+
+from e2e import display  # noqa: E402
+from rbwm.picker import Index  # noqa: E402
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+FRAME_MS = 1000 / 60
+
+# Typed one key at a time; "<" is a backspace
+SCRIPTS = (
+    "site0123",      # narrowing substring
+    "usr9<<er 9",    # typo, two backspaces, then a second term
+    "bnch s5",       # gapped subsequence across the folder and the name
+    "zq",            # no matches at all
+)
+
+
+def keystrokes(script):
+    query = ""
+    for key in script:
+        query = query[:-1] if key == "<" else query + key
+        yield query
+
+
+def type_script(index, script, rows):
+    """Per-keystroke (busy, first screen, complete) times in milliseconds."""
+    results = []
+    for query in keystrokes(script):
+        start = time.perf_counter()
+        search = index.search(query)
+        search.run()
+        busy = time.perf_counter() - start
+        first = None
+        while True:
+            if first is None and (search.done or len(search) >= rows):
+                first = time.perf_counter() - start
+            if search.done:
+                break
+            slice_start = time.perf_counter()
+            search.run()
+            busy = max(busy, time.perf_counter() - slice_start)
+        results.append((busy * 1000, first * 1000, (time.perf_counter() - start) * 1000))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated vault sizes")
+    parser.add_argument("--rows", type=int, default=40, help="rows in a screenful")
+    parser.add_argument("--frame", type=float, default=FRAME_MS, help="busy budget per keystroke in milliseconds")
+    args = parser.parse_args()
+    
+    print(f"{'size':>7}  {'index':>8}  {'busy max':>9}  {'first p50':>9}  {'first max':>9}  {'complete max':>12}")
+    worst = 0.0
+    for size in (int(s) for s in args.sizes.split(",")):
+        items = [display(i) for i in range(size)]
+        start = time.perf_counter()
+        index = Index(items)
+        build = (time.perf_counter() - start) * 1000
+        timings = [t for script in SCRIPTS for t in type_script(index, script, args.rows)]
+        busy = max(t[0] for t in timings)
+        worst = max(worst, busy)
+        first = [t[1] for t in timings]
+        print(f"{size:>7}  {build:>5.1f} ms  {busy:>6.2f} ms  {statistics.median(first):>6.2f} ms  "
+              f"{max(first):>6.2f} ms  {max(t[2] for t in timings):>9.2f} ms")
+    
+    if worst > args.frame:
+        print(f"FAIL: a keystroke kept the picker busy for {worst:.2f} ms (budget {args.frame:.2f} ms)",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,35 +2,39 @@
 """
 rbwm - Bitwarden menu
 Main entry point
+
+Only `sys` is imported up front: every subsystem is imported inside the
+function that first needs it, so startup pays only for what the chosen
+path uses. Check with `python bench/importtime.py`.
 """
 import sys
-from .config import CONFIG, ConfigError
-from .system import System
-from .menu import select_from_menu, prompt_for_input
-from .vault import (
-    ensure_unlocked, lock, sync, get_entries, get_entry_fields,
-    add_entry, edit_entry, remove_entry
-)
-from .inject import type_text, press_tab, press_enter
-
-
-def select_entry(entries, prompt="Select entry"):
-    """Helper to select an entry from a list."""
-    if not entries:
+
+
+def select_entry(entries, notes=False, prompt="Select entry"):
+    """Helper to select a login (or note) entry from an EntryTable."""
+    from .menu import select_from_menu
+    
+    view = entries.notes if notes else entries.logins
+    if not view:
         return None
-    choice = select_from_menu([e["display"] for e in entries], prompt)
-    return next((e for e in entries if e["display"] == choice), None) if choice else None
+    choice = select_from_menu([e.display for e in view], prompt)
+    entry = entries.find(choice) if choice else None
+    return entry if entry and entry.is_note == notes else None
 
 
 def action_details(entries):
     """Handle [Details] menu choice."""
-    login_entries = [e for e in entries if e.get("type") != "Note"]
+    from . import usage
+    from .inject import type_text
+    from .menu import select_from_menu
+    from .vault import get_entry_fields, resolve_field
     
-    entry = select_entry(login_entries)
+    entry = select_entry(entries)
     if not entry:
         return
+    usage.record(entry)
     
-    fields = get_entry_fields(entry["name"])
+    fields = get_entry_fields(entry.name, entry.user, entry.id)
     if not fields:
         return
     
@@ -40,36 +44,51 @@ def action_details(entries):
     
     field = next((f for f in fields if f["display"] == field_choice), None)
     if field:
-        type_text(field["value"])
+        value = resolve_field(field, entry.name, entry.user, entry.id)
+        if value:
+            type_text(value)
 
 
 def action_notes(entries):
     """Handle [Notes] menu choice."""
-    from .vault import get_entry_data
-    
-    note_entries = [e for e in entries if e.get("type") == "Note"]
-    entry = select_entry(note_entries, "Select note")
+    entry = select_entry(entries, notes=True, prompt="Select note")
     
     if entry:
-        data = get_entry_data(entry["name"])
-        notes = data.get("notes", "")
-        if notes:
-            type_text(notes)
+        type_notes(entry)
+
+
+def type_notes(entry):
+    """Type an entry's notes."""
+    from . import usage
+    from .inject import type_text
+    from .vault import get_entry_data
+    
+    usage.record(entry)
+    data = get_entry_data(entry.name, entry.user, entry.id)
+    notes = data.get("notes", "")
+    if notes:
+        type_text(notes)
 
 
 def action_sync():
     """Handle [Sync] menu choice."""
+    from .vault import sync
+    
     sync()
 
 
 def action_lock():
     """Handle [Lock] menu choice."""
+    from .vault import lock
+    
     lock()
 
 
 def action_add():
     """Handle [Add] menu choice."""
+    from .menu import select_from_menu, prompt_for_input
     from .password import password_menu
+    from .vault import add_entry
     
     new_entry = {"name": "", "username": "", "password": "", "uri": "", "folder": "", "notes": ""}
     
@@ -114,16 +133,16 @@ def action_add():
 
 def action_edit(entries):
     """Handle [Edit] menu choice."""
-    from .vault import get_entry_data
+    from .menu import confirm, select_from_menu, prompt_for_input
     from .password import password_menu
+    from .vault import EDIT_IN_PLACE, get_entry_data, edit_entry, lost_on_recreate
     
-    login_entries = [e for e in entries if e.get("type") != "Note"]
-    entry = select_entry(login_entries, "Select entry to edit")
+    entry = select_entry(entries, prompt="Select entry to edit")
     if not entry:
         return
     
     # Get current data
-    data = get_entry_data(entry["name"])
+    data = get_entry_data(entry.name, entry.user, entry.id)
     entry_data = data.get("data", {}) or {}
     edit_fields = {
         "username": entry_data.get("username") or "",
@@ -132,6 +151,7 @@ def action_edit(entries):
         "folder": data.get("folder") or "",
         "notes": data.get("notes") or ""
     }
+    original = dict(edit_fields)
     
     while True:
         fields = []
@@ -143,19 +163,19 @@ def action_edit(entries):
         fields.append("[Save]")
         fields.append("[Discard]")
         
-        field_choice = select_from_menu(fields, f"Edit {entry['name']} - Select field")
+        field_choice = select_from_menu(fields, f"Edit {entry.name} - Select field")
         if not field_choice or field_choice == "[Discard]":
             return
         
         if field_choice == "[Save]":
-            edit_entry(
-                entry["name"],
-                edit_fields["username"],
-                edit_fields["password"],
-                edit_fields["uri"],
-                edit_fields["folder"],
-                edit_fields["notes"]
-            )
+            changes = {k: v for k, v in edit_fields.items() if v != original[k]}
+            lost = lost_on_recreate(data) if changes.keys() - EDIT_IN_PLACE else []
+            if lost and not confirm(f"Saving recreates {entry.name} without its {', '.join(lost)}. Save?"):
+                continue
+            error = edit_entry(entry.name, entry.user, original, entry.id, **changes)
+            if error:
+                from .system import System
+                System.notify(error)
             return
         
         field_name = field_choice.split(":")[0].strip()
@@ -177,77 +197,316 @@ def action_edit(entries):
             edit_fields[field_name] = value
 
 
+def select_entries(entries, prompt):
+    """Helper to select any number of logins from an EntryTable in one menu pass."""
+    from .menu import select_many_from_menu
+    
+    if not entries.logins:
+        return []
+    choices = select_many_from_menu([e.display for e in entries.logins], prompt)
+    return [entry for entry in map(entries.find, choices) if entry and not entry.is_note]
+
+
+def _report_bulk(verb, entries, failed, skipped=()):
+    """Notify once about the outcome of a bulk operation."""
+    from .system import System
+    
+    message = f"{verb} {len(entries) - len(failed) - len(skipped)} of {len(entries)} entries"
+    for label, listed in (("failed", failed), ("skipped, with TOTP or custom fields", skipped)):
+        if listed:
+            message += f"; {label}: " + ", ".join(e.display for e in listed[:5])
+            if len(listed) > 5:
+                message += f" and {len(listed) - 5} more"
+    System.notify(message)
+
+
 def action_remove(entries):
     """Handle [Remove] menu choice."""
-    login_entries = [e for e in entries if e.get("type") != "Note"]
-    entry = select_entry(login_entries, "Select entry to remove")
-    if entry:
-        remove_entry(entry["name"])
+    from .bulk import remove_entries
+    from .menu import confirm
+    from .vault import remove_entry
+    
+    selected = select_entries(entries, "Select entries to remove")
+    if len(selected) == 1:
+        remove_entry(selected[0].name, selected[0].user, selected[0].id)
+    elif selected and confirm(f"Remove {len(selected)} entries?"):
+        _report_bulk("Removed", selected, remove_entries(selected))
+
+
+def action_move(entries):
+    """Handle [Move] menu choice."""
+    from .bulk import move_entries
+    from .menu import confirm, select_from_menu
+    
+    selected = select_entries(entries, "Select entries to move")
+    if not selected:
+        return
+    folders = sorted({e.folder for e in entries.logins if e.folder})
+    folder = select_from_menu(folders, "Move to folder")
+    if folder is None:
+        return
+    # Moving recreates each entry, which rbw add can only do without TOTP
+    # secrets and custom fields, so entries that have them are left alone
+    if confirm(f"Move {len(selected)} entries to {folder or 'no folder'}? "
+               "Each is recreated; entries with TOTP or custom fields are skipped"):
+        _report_bulk("Moved", selected, *move_entries(selected, folder))
 
 
 def action_autofill(entries, choice):
     """Handle direct entry selection for autofill."""
+    from . import usage
+    from .config import CONFIG
+    from .inject import type_text, type_sequence
     from .vault import get_entry_data
     
-    login_entries = [e for e in entries if e.get("type") != "Note"]
-    entry = next((e for e in login_entries if e["display"] == choice), None)
-    if not entry:
+    entry = entries.find(choice)
+    if not entry or entry.is_note:
         return
+    usage.record(entry)
     
-    data = get_entry_data(entry["name"])
+    data = get_entry_data(entry.name, entry.user, entry.id)
     entry_data = data.get("data", {}) or {}
     username = entry_data.get("username") or ""
     password = entry_data.get("password") or ""
     
     if username and password:
-        type_text(username)
-        press_tab()
-        type_text(password)
-        press_enter()
+        type_sequence([
+            ("text", username),
+            ("key", "Tab"),
+            ("text", password),
+            ("key", "Return"),
+        ])
     elif username:
         type_text(username)
     elif password:
         type_text(password)
+    else:
+        # Cards and identities have neither; say so rather than type nothing
+        from .system import System
+        System.notify(f"{entry.name} has no username or password to autofill; use [Details]")
+        return
+    
+    if password and entry_data.get("totp") and CONFIG.get_autofill_totp():
+        import time
+        from .vault import get_totp_code
+        
+        # Give the site time to show its code prompt
+        time.sleep(CONFIG.get_autofill_totp_delay())
+        code = get_totp_code(entry_data["totp"], entry.name, entry.user, entry.id)
+        if code:
+            type_sequence([("text", code), ("key", "Return")], direct=True)
+
+
+def start_listing():
+    """Start loading config and entries; returns a Listing."""
+    from . import trace
+    from .config import CONFIG
+    from .vault import Listing
+    
+    listing = Listing()
+    with trace.span("config"):
+        CONFIG.load()
+        if CONFIG.errors:
+            from .system import System
+            System.in_background(System.notify, "Config uses defaults for: " + "; ".join(CONFIG.errors))
+    return listing
+
+
+def main_menu(listing, window_title):
+    """Show the main menu and run the chosen action."""
+    from . import usage
+    from .menu import open_menu
+    from .vault import Listing, unlock, prefetch
+    
+    if listing.cached() is not None:
+        # Forget deleted entries first, so ranking never waits for them
+        usage.prune(listing.cached())
+    scores = usage.load_scores()
+    entries = None
+    
+    MENU_ACTIONS = {
+        "[Details]": lambda: action_details(entries),
+        "[Notes]": lambda: action_notes(entries),
+        "[Sync]": action_sync,
+        "[Add]": action_add,
+        "[Edit]": lambda: action_edit(entries),
+        "[Remove]": lambda: action_remove(entries),
+        "[Move]": lambda: action_move(entries),
+        "[Lock]": action_lock,
+    }
+    
+    for attempt in range(2):
+        # Open the menu while the listing is still in flight and stream
+        # entries into it, most frecent first, as they are parsed
+        menu = open_menu("Bitwarden")
+        menu.add(MENU_ACTIONS.keys())
+        menu.add(e.display for e in usage.rank(listing.stream(), scores) if not e.is_note)
+        
+        entries = listing.result()
+        if entries is not None:
+            break
+        
+        # Locked: close the menu, unlock and list again
+        menu.cancel()
+        if attempt or not unlock():
+            return
+        listing = Listing()
+    
+    # Fetch the likely picks while the user is still typing
+    prefetch(entries.match_window(window_title.result()) + usage.top(entries.logins, 3, scores))
+    choice = menu.choose()
+    usage.prune(entries)
+    
+    if not choice:
+        return
+    
+    if choice in MENU_ACTIONS:
+        MENU_ACTIONS[choice]()
+    else:
+        action_autofill(entries, choice)
+
+
+def match_window(listing, window_title):
+    """Autofill the login matching the focused window, after confirmation.
+    
+    Logins saved for a domain in the title, else those named in it, open
+    a menu of just those; none falls back to the main menu.
+    """
+    from . import usage
+    from .menu import select_from_menu
+    from .vault import Listing, get_entries, unlock, prefetch
+    
+    entries = listing.result()
+    if entries is None:
+        if not unlock():
+            return
+        entries = get_entries()
+    
+    # A page controls its own title, hostname included, and registrable
+    # domains are only approximated (no public suffix list), so even a
+    # single match is only typed once picked from the menu
+    matches = entries.match_window(window_title.result())
+    if not matches:
+        main_menu(Listing.finished(entries), window_title)
+        return
+    
+    prefetch(matches)
+    choice = select_from_menu([e.display for e in usage.rank(matches)], "Bitwarden")
+    if choice:
+        action_autofill(entries, choice)
+
+
+def autofill_matching(listing, query="", folder=None, type=None):
+    """Autofill the entry matching --query/--folder/--type.
+    
+    A single match is typed without showing a menu, several open a menu
+    of just those, and none is reported in a notification. An entry named
+    exactly like the query counts as a single match.
+    """
+    from . import usage
+    from .menu import select_from_menu
+    from .system import System
+    from .vault import get_entries, unlock, prefetch
+    
+    entries = listing.result()
+    if entries is None:
+        if not unlock():
+            return
+        entries = get_entries()
+    
+    matches = entries.search(query, folder, type)
+    named = [e for e in matches if query.strip() and e.name.lower() == query.strip().lower()]
+    if len(named) == 1:
+        matches = named
+    if not matches:
+        filters = [("query", query or None), ("folder", folder), ("type", type)]
+        System.notify("No entry matches " + ", ".join(f"{k} {v!r}" for k, v in filters if v is not None))
+        return
+    
+    if len(matches) == 1:
+        entry = matches[0]
+    else:
+        matches = list(usage.rank(matches))
+        prefetch(matches)
+        choice = select_from_menu([e.display for e in matches], "Bitwarden")
+        entry = entries.find(choice) if choice else None
+    if entry is None:
+        return
+    if entry.is_note:
+        type_notes(entry)
+    else:
+        action_autofill(entries, entry.display)
+
+
+def parse_args(argv):
+    """Options of a plain `rbwm` launch."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog="rbwm", description="Bitwarden menu for rbw.")
+    parser.add_argument("--match-window", action="store_true",
+                        help="autofill the login matching the focused window")
+    parser.add_argument("--query", default="",
+                        help="autofill the entry matching these words (name, username or domain)")
+    parser.add_argument("--folder", help="only consider entries in this folder (\"\" for none)")
+    parser.add_argument("--type", choices=("login", "note", "card", "identity"),
+                        help="only consider entries of this type (default: all but notes)")
+    args = parser.parse_args(argv)
+    if args.match_window and (args.query or args.folder is not None or args.type):
+        parser.error("--match-window cannot be combined with --query, --folder or --type")
+    return args
 
 
 def main():
+    # Imported first so that, with RBWM_TRACE set, every command is traced
+    from . import trace
+    
     # Handle setup command
     if len(sys.argv) > 1 and sys.argv[1] == "setup":
+        from .config import CONFIG
         CONFIG._setup_cli()
         return
     
+    if len(sys.argv) > 1 and sys.argv[1] == "daemon":
+        from .daemon import serve
+        serve()
+        return
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "genpass":
+        from .password import run
+        sys.exit(run(sys.argv[2:]))
+    
+    if len(sys.argv) > 1 and sys.argv[1] in ("import", "export"):
+        from .bulk import run
+        sys.exit(run(sys.argv[1], sys.argv[2:]))
+    
+    # Plain launches skip argparse
+    args = parse_args(sys.argv[1:]) if len(sys.argv) > 1 else None
+    filtered = args is not None and (args.query or args.folder is not None or args.type)
+    
+    from .config import ConfigError
+    from .system import System
+    from .vault import clear_prefetched
+    
+    span = trace.span("main")
     try:
-        CONFIG.load()
-        
-        if not ensure_unlocked():
+        listing = start_listing()
+        if filtered:
+            autofill_matching(listing, args.query, args.folder, args.type)
             return
         
-        entries = get_entries()
-        login_entries = [e for e in entries if e.get("type") != "Note"]
-        
-        MENU_ACTIONS = {
-            "[Details]": lambda: action_details(entries),
-            "[Notes]": lambda: action_notes(entries),
-            "[Sync]": action_sync,
-            "[Add]": action_add,
-            "[Edit]": lambda: action_edit(entries),
-            "[Remove]": lambda: action_remove(entries),
-            "[Lock]": action_lock,
-        }
-        
-        menu_items = list(MENU_ACTIONS.keys()) + [e["display"] for e in login_entries]
-        choice = select_from_menu(menu_items, "Bitwarden")
-        
-        if not choice:
-            return
+        # Read the focused window before any menu takes focus
+        window_title = System.in_background(System.active_window_title)
         
-        if choice in MENU_ACTIONS:
-            MENU_ACTIONS[choice]()
+        if args is not None and args.match_window:
+            match_window(listing, window_title)
         else:
-            action_autofill(entries, choice)
+            main_menu(listing, window_title)
     
     except ConfigError as e:
         System.notify(str(e))
+    finally:
+        clear_prefetched()
+        span.end()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,448 @@
+"""
+Bulk import and export of vault entries.
+
+`rbwm import FILE` adds every record of a CSV or JSON file with `rbw add`,
+and `rbwm export` writes every entry with its details as JSON. Both keep a
+bounded number of rbw processes running at once, so throughput is limited
+by rbw rather than by a serial loop.
+
+Import reads:
+- CSV with Bitwarden export columns (name, login_username, login_password,
+  login_uri, folder, notes) or plain ones (name, username, password, uri,
+  folder, notes)
+- Bitwarden JSON exports ({"folders": [...], "items": [...]})
+- rbwm exports ({"entries": [...]}, `rbw get --raw` records)
+- a JSON array of any of the record shapes above
+"""
+import json
+import sys
+import time
+
+DEFAULT_JOBS = 4
+RETRIES = 2
+RETRY_DELAY = 0.5
+PROGRESS_INTERVAL = 5.0
+
+# Column aliases for CSV imports
+_CSV_FIELDS = {
+    "name": ("name", "title"),
+    "username": ("login_username", "username", "user", "login"),
+    "password": ("login_password", "password"),
+    "uri": ("login_uri", "uri", "url"),
+    "folder": ("folder",),
+    "notes": ("notes", "note", "extra"),
+    "totp": ("login_totp", "totp"),
+}
+
+
+def normalize(item, folders=None):
+    """Reduce one imported record to name/username/password/uris/folder/notes.
+    
+    Also reports what `rbw add` cannot store, under "skipped".
+    """
+    if "data" in item:
+        # rbw get --raw record
+        login = item.get("data") or {}
+        uris = [u.get("uri") if isinstance(u, dict) else u for u in login.get("uris") or []]
+        folder = item.get("folder")
+    elif "login" in item or "folderId" in item:
+        # Bitwarden export item
+        login = item.get("login") or {}
+        uris = [u.get("uri") for u in login.get("uris") or []]
+        folder = (folders or {}).get(item.get("folderId"))
+    else:
+        login = item
+        uris = item.get("uris") or [item.get("uri")]
+        folder = item.get("folder")
+    
+    skipped = []
+    if login.get("totp"):
+        skipped.append("totp")
+    if item.get("fields"):
+        skipped.append("custom fields")
+    return {
+        "name": (item.get("name") or "").strip(),
+        "username": login.get("username") or "",
+        "password": login.get("password") or "",
+        "uris": [u for u in uris if u],
+        "folder": folder or "",
+        "notes": item.get("notes") or "",
+        "skipped": skipped,
+    }
+
+
+def _read_csv(path):
+    import csv
+    
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        columns = {c.strip().lower(): c for c in reader.fieldnames or []}
+        mapping = {}
+        for field, aliases in _CSV_FIELDS.items():
+            column = next((columns[a] for a in aliases if a in columns), None)
+            if column:
+                mapping[field] = column
+        for row in reader:
+            yield normalize({field: row.get(column) or "" for field, column in mapping.items()})
+
+
+def _read_json(path):
+    from .vault import _iter_json_array
+    
+    with open(path, "rb") as f:
+        while (head := f.read(1)).isspace():
+            pass
+        f.seek(0)
+        if head == b"[":
+            for item in _iter_json_array(f):
+                yield normalize(item)
+            return
+        data = json.load(f)
+    
+    folders = {folder.get("id"): folder.get("name") for folder in data.get("folders") or []}
+    for item in data.get("items") or data.get("entries") or []:
+        yield normalize(item, folders)
+
+
+def read_records(path):
+    """Yield normalized records from a CSV or JSON file."""
+    if str(path).lower().endswith(".csv"):
+        return _read_csv(path)
+    return _read_json(path)
+
+
+def _with_retries(fn, succeeded, retries):
+    """Call fn() until succeeded(result), retrying up to `retries` times with backoff."""
+    result = fn()
+    for attempt in range(retries):
+        if succeeded(result):
+            break
+        time.sleep(RETRY_DELAY * 2 ** attempt)
+        result = fn()
+    return result
+
+
+def _key(record):
+    """What the vault listing can tell apart: name, username and folder."""
+    return (record["name"], record["username"], record["folder"])
+
+
+class _AddCheck:
+    """Tells whether a failed `rbw add` stored its entry anyway.
+    
+    rbw add is not idempotent, and it can fail after the server has
+    created the item. Before such an add is retried, a synced listing is
+    compared with the one from before the import, less the adds already
+    known to have succeeded. Callers never add two records with the same
+    _key() at once, so an entry that appeared can only be the failed one.
+    Failures share a listing synced after all of them failed.
+    """
+    
+    def __init__(self):
+        import threading
+        from collections import Counter
+        
+        self._before = self._count()
+        self._added = Counter()
+        self._lock = threading.Lock()
+        self._listing = None
+        self._listed_at = float("-inf")
+    
+    @staticmethod
+    def _count():
+        from collections import Counter
+        from .vault import get_entries
+        
+        return Counter((e.name, e.user, e.folder) for e in get_entries())
+    
+    def succeeded(self, key):
+        with self._lock:
+            self._added[key] += 1
+    
+    def stored(self, key, failed_at):
+        """Whether an entry for key appeared that no successful add accounts for."""
+        from .vault import sync
+        
+        with self._lock:
+            if self._listed_at < failed_at:
+                self._listed_at = time.monotonic()
+                sync()
+                self._listing = self._count()
+            if self._listing[key] > self._before[key] + self._added[key]:
+                self._added[key] += 1
+                return True
+            return False
+
+
+def run_bounded(fn, items, jobs):
+    """Yield (item, fn(item)) in input order, with at most ~2*jobs calls in flight."""
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    
+    with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="rbwm-bulk") as pool:
+        pending = deque()
+        for item in items:
+            pending.append((item, pool.submit(fn, item)))
+            if len(pending) >= 2 * jobs:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+
+class Progress:
+    """Progress on stderr, with a notification at most every PROGRESS_INTERVAL seconds."""
+    
+    def __init__(self, verb):
+        self.verb = verb
+        self.done = 0
+        self.failed = 0
+        self._last_notice = time.monotonic()
+    
+    def step(self, ok):
+        from .system import System
+        
+        self.done += 1
+        self.failed += not ok
+        print(f"\r{self.verb} {self.done} entries ({self.failed} failed)", end="", file=sys.stderr)
+        now = time.monotonic()
+        if now - self._last_notice >= PROGRESS_INTERVAL:
+            self._last_notice = now
+            System.notify(f"{self.verb} {self.done} entries so far")
+
+
+def import_entries(records, jobs=DEFAULT_JOBS, retries=RETRIES):
+    """Add records through a bounded pool of `rbw add` runs.
+    
+    A failed add is only retried once a synced listing shows it did not
+    store the entry. Rows repeated exactly are skipped, and records with
+    the same name, username and folder run in separate passes. Returns a
+    report: {"added": n, "failed": [(record, error)],
+    "skipped": [(record, [fields or "duplicate row"])]}.
+    """
+    from . import cache, trace
+    from .vault import run_add
+    
+    check = _AddCheck()
+    
+    def add(record):
+        key = _key(record)
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+            result = run_add(record["name"], record["username"], record["password"],
+                             record["uris"], record["folder"], record["notes"])
+            if result.returncode == 0:
+                check.succeeded(key)
+                return None
+            if check.stored(key, time.monotonic()):
+                return None
+        return result.stderr.strip() or f"exit {result.returncode}"
+    
+    report = {"added": 0, "failed": [], "skipped": []}
+    
+    deferred = []
+    
+    def first_pass(records):
+        """Named, deduplicated records, holding back repeats of a _key()."""
+        import hashlib
+        
+        rows = set()
+        keys = set()
+        for record in records:
+            if not record["name"]:
+                report["failed"].append((record, "no name"))
+                continue
+            # A digest, so the set does not keep every password in memory
+            row = hashlib.blake2b(json.dumps(record, sort_keys=True).encode(), digest_size=16).digest()
+            if row in rows:
+                report["skipped"].append((record, ["duplicate row"]))
+                continue
+            rows.add(row)
+            if _key(record) in keys:
+                deferred.append(record)
+            else:
+                keys.add(_key(record))
+                yield record
+    
+    def later_pass():
+        """Held-back records, again at most one per _key()."""
+        batch = list(deferred)
+        deferred.clear()
+        keys = set()
+        for record in batch:
+            if _key(record) in keys:
+                deferred.append(record)
+            else:
+                keys.add(_key(record))
+                yield record
+    
+    progress = Progress("Imported")
+    with trace.span("import", jobs=jobs):
+        try:
+            # A pass only starts once the one before it has finished
+            records = first_pass(records)
+            while records is not None:
+                for record, error in run_bounded(add, records, jobs):
+                    if error is None:
+                        report["added"] += 1
+                        if record["skipped"]:
+                            report["skipped"].append((record, record["skipped"]))
+                    else:
+                        report["failed"].append((record, error))
+                    progress.step(error is None)
+                records = later_pass() if deferred else None
+        finally:
+            cache.invalidate()
+    return report
+
+
+def export_entries(out, jobs=DEFAULT_JOBS, retries=RETRIES):
+    """Stream every entry's `rbw get --raw` record to out as {"entries": [...]}.
+    
+    Returns the entries that could not be fetched.
+    """
+    from . import trace
+    from .vault import get_entries, _fetch_entry_data
+    
+    def fetch(entry):
+        return _with_retries(lambda: _fetch_entry_data(entry.name, entry.user, entry.id), bool, retries)
+    
+    failed = []
+    progress = Progress("Exported")
+    with trace.span("export", jobs=jobs):
+        out.write('{"entries": [')
+        first = True
+        for entry, data in run_bounded(fetch, get_entries(), jobs):
+            progress.step(bool(data))
+            if not data:
+                failed.append(entry)
+                continue
+            out.write(("\n" if first else ",\n") + json.dumps(data))
+            first = False
+        out.write("\n]}\n")
+    return failed
+
+
+def remove_entries(entries, jobs=DEFAULT_JOBS):
+    """Remove entries with concurrent `rbw remove` runs; returns the ones that failed."""
+    from . import cache, trace
+    from .vault import remove_entry
+    
+    with trace.span("remove", entries=len(entries), jobs=jobs):
+        try:
+            return [entry for entry, ok in run_bounded(lambda e: remove_entry(e.name, e.user, e.id), entries, jobs)
+                    if not ok]
+        finally:
+            cache.invalidate()
+
+
+def move_entries(entries, folder, jobs=DEFAULT_JOBS):
+    """Move logins to a folder; returns (failed, skipped) entries.
+    
+    rbw cannot change an entry's folder in place, so each entry is fetched
+    and added anew under the new folder, and the old one is removed by its
+    ID once that succeeded. rbw add cannot store TOTP secrets or custom
+    fields, so entries that have them are skipped rather than stripped.
+    """
+    from . import cache, trace
+    from .vault import _fetch_entry_data, remove_entry, run_add
+    
+    def move(entry):
+        data = _fetch_entry_data(entry.name, entry.user, entry.id)
+        if not data:
+            return "failed"
+        record = normalize(data)
+        if record["folder"] == folder:
+            return "moved"
+        if record["skipped"]:
+            return "skipped"
+        result = run_add(record["name"], record["username"], record["password"],
+                         record["uris"], folder, record["notes"])
+        if result.returncode != 0 or not remove_entry(entry.name, entry.user, entry.id):
+            return "failed"
+        return "moved"
+    
+    outcomes = {"moved": [], "failed": [], "skipped": []}
+    with trace.span("move", entries=len(entries), jobs=jobs):
+        try:
+            for entry, outcome in run_bounded(move, entries, jobs):
+                outcomes[outcome].append(entry)
+        finally:
+            cache.invalidate()
+    return outcomes["failed"], outcomes["skipped"]
+
+
+def _open_export(path):
+    """Open an export file readable only by the user; "-" is stdout."""
+    import os
+    
+    if path == "-":
+        return sys.stdout
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    return os.fdopen(fd, "w")
+
+
+def _describe(record):
+    return record["name"] + (f" ({record['username']})" if record["username"] else "")
+
+
+def run(command, argv):
+    """Entry point for `rbwm import` and `rbwm export`; returns the exit status."""
+    import argparse
+    from .config import CONFIG
+    from .system import System
+    from .vault import ensure_unlocked
+    
+    parser = argparse.ArgumentParser(prog=f"rbwm {command}")
+    if command == "import":
+        parser.add_argument("file", help="CSV or JSON file to import")
+    else:
+        parser.add_argument("-o", "--output", default="-", help="file to write (default: stdout)")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS, help="rbw processes to run at once")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="retries per failed entry")
+    args = parser.parse_args(argv)
+    jobs = max(1, args.jobs)
+    
+    CONFIG.load()
+    for error in CONFIG.errors:
+        print(f"config: {error}, using the default", file=sys.stderr)
+    if not ensure_unlocked():
+        print("Vault is locked", file=sys.stderr)
+        return 1
+    
+    if command == "export":
+        out = _open_export(args.output)
+        try:
+            failed = export_entries(out, jobs, args.retries)
+        finally:
+            # Leave stdout open for the summary and the interpreter
+            if out is sys.stdout:
+                out.flush()
+            else:
+                out.close()
+        print(file=sys.stderr)
+        for entry in failed:
+            print(f"failed: {entry.display}", file=sys.stderr)
+        summary = "Export finished" + (f", {len(failed)} entries failed" if failed else "")
+        print(summary, file=sys.stderr)
+        System.notify(summary)
+        return 1 if failed else 0
+    
+    try:
+        report = import_entries(read_records(args.file), jobs, args.retries)
+    except (OSError, ValueError) as e:
+        print(f"\nCannot read {args.file}: {e}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+    for record, fields in report["skipped"]:
+        print(f"not imported for {_describe(record)}: {', '.join(fields)}", file=sys.stderr)
+    for record, error in report["failed"]:
+        print(f"failed: {_describe(record) or '(unnamed)'}: {error}", file=sys.stderr)
+    summary = f"Imported {report['added']} entries"
+    if report["failed"]:
+        summary += f", {len(report['failed'])} failed"
+    print(summary, file=sys.stderr)
+    System.notify(summary)
+    return 1 if report["failed"] else 0
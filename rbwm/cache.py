@@ -0,0 +1,73 @@
+"""On-disk cache of the non-secret vault listing."""
+import json
+import os
+from pathlib import Path
+
+CACHE_VERSION = 2
+
+
+def get_dir() -> Path:
+    """Get cache directory, creating if needed."""
+    base = os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')
+    path = Path(base) / "rbwm"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def entries_file() -> Path:
+    return get_dir() / "entries.json"
+
+
+def rbw_db_stamp():
+    """Fingerprint rbw's local database files by name, mtime and size.
+    
+    Returns None when no database can be found, which disables caching.
+    """
+    base = Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache'))
+    profile = os.environ.get("RBW_PROFILE")
+    db_dir = base / (f"rbw-{profile}" if profile else "rbw")
+    stamp = []
+    try:
+        for path in sorted(db_dir.glob("*.json")):
+            st = path.stat()
+            stamp.append([path.name, st.st_mtime_ns, st.st_size])
+    except OSError:
+        return None
+    return stamp or None
+
+
+def load_entries(stamp):
+    """Return cached entries if they were stored for this database stamp."""
+    if stamp is None:
+        return None
+    try:
+        with open(entries_file()) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("version") != CACHE_VERSION or cached.get("stamp") != stamp:
+        return None
+    return cached.get("entries")
+
+
+def store_entries(stamp, entries):
+    """Atomically write the listing for this database stamp."""
+    if stamp is None:
+        return
+    path = entries_file()
+    tmp = path.with_suffix(".tmp")
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": CACHE_VERSION, "stamp": stamp, "entries": entries}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def invalidate():
+    """Drop the cached listing after the vault changed."""
+    try:
+        entries_file().unlink()
+    except OSError:
+        pass
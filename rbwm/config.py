@@ -16,86 +16,247 @@ MENU_PROGRAMS = ["dmenu", "bemenu", "rofi", "wmenu", "fuzzel", "tofi"]
 PINENTRY_PROGRAMS = ["pinentry-dmenu", "pinentry-curses", "pinentry-gnome3", "pinentry-qt", "pinentry"]
 
 
+def _parse_bool(value):
+    lowered = value.lower()
+    if lowered not in ("true", "false"):
+        raise ValueError("expected true or false")
+    return lowered == "true"
+
+
+def _parse_count(minimum):
+    def parse(value):
+        try:
+            number = int(value)
+        except ValueError:
+            number = None
+        if number is None or number < minimum:
+            raise ValueError(f"expected a whole number of at least {minimum}")
+        return number
+    return parse
+
+
+def _parse_seconds(value):
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = None
+    if seconds is None or not seconds >= 0:
+        raise ValueError("expected a number of seconds")
+    return seconds
+
+
+# Settings with a default, and how their values are parsed and validated
+SETTINGS = {
+    "PASSWORD_LENGTH": ("16", _parse_count(1)),
+    "PASSWORD_SPECIAL": ("true", _parse_bool),
+    "PASSWORD_NUMBERS": ("true", _parse_bool),
+    "PASSWORD_LETTERS": ("true", _parse_bool),
+    "PASSWORD_MIN_PER_CLASS": ("1", _parse_count(0)),
+    "PASSWORD_EXCLUDE_AMBIGUOUS": ("false", _parse_bool),
+    "CLIPBOARD_RESTORE_DELAY": ("0.5", _parse_seconds),
+    "PASTE_SETTLE_DELAY": ("0.15", _parse_seconds),
+    "AUTOFILL_TOTP": ("false", _parse_bool),
+    "AUTOFILL_TOTP_DELAY": ("1.5", _parse_seconds),
+    "XTEST_INJECTOR": ("false", _parse_bool),
+}
+
+
 class Config:
     APP_NAME = "rbwm"
+    _dir = None
     
     def __init__(self):
         self._config = None
+        self._values = {}
+        self._file_key = None
+        self.errors = []
+        self._menu_cmd = None
+        self._pinentry_cmd = None
         self._menu_fallback_confirmed = False
         self._pinentry_fallback_confirmed = False
     
     @staticmethod
     def get_dir() -> Path:
-        """Get config directory, creating if needed."""
-        base = os.environ.get('XDG_CONFIG_HOME', Path.home() / '.config')
-        path = Path(base) / Config.APP_NAME
-        path.mkdir(parents=True, exist_ok=True)
-        return path
+        """Get config directory, creating it on first use."""
+        if Config._dir is None:
+            base = os.environ.get('XDG_CONFIG_HOME', Path.home() / '.config')
+            path = Path(base) / Config.APP_NAME
+            path.mkdir(parents=True, exist_ok=True)
+            Config._dir = path
+        return Config._dir
     
     @property
     def config_file(self) -> Path:
         return self.get_dir() / 'config'
     
+    def _stat_key(self):
+        """What identifies the file's current contents, or None if there is none."""
+        try:
+            st = self.config_file.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    
     def load(self):
-        """Load configuration from file or run setup."""
-        if not self.config_file.exists():
-            self._config = self._setup()
-        else:
-            self._config = {}
+        """Load configuration from file or run setup.
+        
+        The file is parsed again only after it changed, so repeated loads
+        return the same snapshot.
+        """
+        key = self._stat_key()
+        if key is None:
+            self._setup()
+            key = self._stat_key()
+        elif key == self._file_key and self._config is not None:
+            return self._config
+        
+        config = {}
+        with open(self.config_file) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if "=" in line:
+                    name, value = line.split("=", 1)
+                    config[name.strip()] = value.strip()
+        
+        self._menu_cmd = None
+        self._pinentry_cmd = None
+        self._adopt(config)
+        self._file_key = key
+        return self._config
+    
+    def _adopt(self, config):
+        """Make config the current snapshot, validating every known setting.
+        
+        Invalid values are reported in self.errors and replaced by defaults.
+        """
+        config = dict(config)
+        values = {}
+        errors = []
+        for name, (default, parse) in SETTINGS.items():
+            config.setdefault(name, default)
+            try:
+                values[name] = parse(config[name])
+            except ValueError as e:
+                errors.append(f"{name}={config[name]}: {e}")
+                values[name] = parse(default)
+        self._config = config
+        self._values = values
+        self.errors = errors
+    
+    def get(self, name):
+        """Parsed value of a setting from SETTINGS."""
+        if name in self._values:
+            return self._values[name]
+        default, parse = SETTINGS[name]
+        return parse(default)
+    
+    def update(self, changes):
+        """Store settings in the config file, leaving the rest of it untouched.
+        
+        Nothing is written unless a value differs from the current one; the
+        new file replaces the old one in a single rename. Returns whether
+        the file was written.
+        """
+        if self._config is None:
+            self.load()
+        changes = {name: str(value) for name, value in changes.items()
+                   if self._config.get(name) != str(value)}
+        if not changes:
+            return False
+        
+        lines = []
+        if self.config_file.exists():
             with open(self.config_file) as f:
-                for line in f:
-                    line = line.strip()
-                    if not line or line.startswith("#"):
-                        continue
-                    if "=" in line:
-                        key, value = line.split("=", 1)
-                        self._config[key.strip()] = value.strip()
-        
-        # Set default password generation settings if not present
-        if "PASSWORD_LENGTH" not in self._config:
-            self._config["PASSWORD_LENGTH"] = "16"
-        if "PASSWORD_SPECIAL" not in self._config:
-            self._config["PASSWORD_SPECIAL"] = "true"
-        if "PASSWORD_NUMBERS" not in self._config:
-            self._config["PASSWORD_NUMBERS"] = "true"
-        if "PASSWORD_LETTERS" not in self._config:
-            self._config["PASSWORD_LETTERS"] = "true"
+                lines = f.readlines()
         
-        return self._config
+        pending = dict(changes)
+        for i, line in enumerate(lines):
+            if "=" in line and not line.strip().startswith("#"):
+                name = line.split("=", 1)[0].strip()
+                if name in pending:
+                    lines[i] = f"{name}={pending.pop(name)}\n"
+        if lines and not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        lines.extend(f"{name}={value}\n" for name, value in pending.items())
+        
+        self._write("".join(lines))
+        self._adopt({**self._config, **changes})
+        self._file_key = self._stat_key()
+        return True
+    
+    def _write(self, content):
+        """Replace the config file atomically, keeping its permissions."""
+        import tempfile
+        
+        path = self.config_file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".config.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+            try:
+                os.chmod(tmp, path.stat().st_mode & 0o777)
+            except FileNotFoundError:
+                os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    
+    def _detect_menu(self):
+        """First installed menu program, in Wayland-aware order."""
+        wayland = os.environ.get("WAYLAND_DISPLAY")
+        order = (
+            ["fuzzel", "tofi", "wmenu", "bemenu", "rofi", "dmenu"] 
+            if wayland 
+            else MENU_PROGRAMS
+        )
+        
+        for menu in order:
+            if System.has_command(menu):
+                return menu
+        
+        # No graphical menu: pick in the terminal when there is one
+        from .picker import has_terminal
+        if has_terminal():
+            return "builtin"
+        
+        raise ConfigError(f"No menu program found. Install one of: {', '.join(MENU_PROGRAMS)}")
     
     def get_menu_cmd(self):
-        """Get menu command with fallback logic."""
+        """Get menu command with fallback logic (resolved once per session)."""
+        if self._menu_cmd:
+            return self._menu_cmd
+        
+        from .menu import is_builtin
+        
         configured = self._config.get("MENU_CMD")
         
-        if configured == "auto" or not System.has_command(configured):
-            wayland = os.environ.get("WAYLAND_DISPLAY")
-            order = (
-                ["fuzzel", "tofi", "wmenu", "bemenu", "rofi", "dmenu"] 
-                if wayland 
-                else MENU_PROGRAMS
-            )
-            
-            menu_cmd = None
-            for menu in order:
-                if System.has_command(menu):
-                    menu_cmd = menu
-                    break
-            
-            if not menu_cmd:
-                raise ConfigError(f"No menu program found. Install one of: {', '.join(MENU_PROGRAMS)}")
+        if is_builtin(configured):
+            menu_cmd = configured
+        elif configured == "auto" or not System.has_command(configured):
+            menu_cmd = self._detect_menu()
             
             # Confirmation prompt if we fell back (only once per session)
             if configured and configured != "auto" and not self._menu_fallback_confirmed:
                 from .menu import select_from_menu_raw
                 select_from_menu_raw(menu_cmd, ["Ok"], f"{configured} not found, using {menu_cmd}")
                 self._menu_fallback_confirmed = True
-            
-            return menu_cmd
+        else:
+            menu_cmd = configured
         
-        return configured
+        self._menu_cmd = menu_cmd
+        return menu_cmd
     
     def get_pinentry_cmd(self):
-        """Get pinentry command with fallback logic."""
+        """Get pinentry command with fallback logic (resolved once per session)."""
+        if self._pinentry_cmd:
+            return self._pinentry_cmd
+        
         configured = self._config.get("PINENTRY_CMD")
         
         if not System.has_command(configured):
@@ -110,80 +271,70 @@ class Config:
             
             # Confirmation prompt before using fallback (only once per session)
             if not self._pinentry_fallback_confirmed:
-                from .menu import select_from_menu_raw
+                from .menu import is_builtin, select_from_menu_raw
                 # Get menu_cmd WITHOUT triggering its fallback confirmation
                 menu_configured = self._config.get("MENU_CMD")
-                if menu_configured == "auto" or not System.has_command(menu_configured):
-                    import os
-                    wayland = os.environ.get("WAYLAND_DISPLAY")
-                    order = (
-                        ["fuzzel", "tofi", "wmenu", "bemenu", "rofi", "dmenu"] 
-                        if wayland 
-                        else MENU_PROGRAMS
-                    )
-                    menu_cmd = None
-                    for menu in order:
-                        if System.has_command(menu):
-                            menu_cmd = menu
-                            break
-                    if not menu_cmd:
-                        raise ConfigError(f"No menu program found. Install one of: {', '.join(MENU_PROGRAMS)}")
+                if self._menu_cmd:
+                    menu_cmd = self._menu_cmd
+                elif is_builtin(menu_configured):
+                    menu_cmd = menu_configured
+                elif menu_configured == "auto" or not System.has_command(menu_configured):
+                    menu_cmd = self._detect_menu()
                 else:
                     menu_cmd = menu_configured
                 
                 select_from_menu_raw(menu_cmd, ["Ok"], f"{configured} not found, using {pinentry_cmd}")
                 self._pinentry_fallback_confirmed = True
-            
-            return pinentry_cmd
+        else:
+            pinentry_cmd = configured
         
-        return configured
+        self._pinentry_cmd = pinentry_cmd
+        return pinentry_cmd
     
     def get_password_settings(self):
         """Get password generation settings."""
         return {
-            "length": int(self._config.get("PASSWORD_LENGTH", "16")),
-            "special": self._config.get("PASSWORD_SPECIAL", "true").lower() == "true",
-            "numbers": self._config.get("PASSWORD_NUMBERS", "true").lower() == "true",
-            "letters": self._config.get("PASSWORD_LETTERS", "true").lower() == "true",
+            "length": self.get("PASSWORD_LENGTH"),
+            "special": self.get("PASSWORD_SPECIAL"),
+            "numbers": self.get("PASSWORD_NUMBERS"),
+            "letters": self.get("PASSWORD_LETTERS"),
+            "min_per_class": self.get("PASSWORD_MIN_PER_CLASS"),
+            "exclude_ambiguous": self.get("PASSWORD_EXCLUDE_AMBIGUOUS"),
         }
     
-    def save_password_settings(self, length, special, numbers, letters):
-        """Save password generation settings to config file."""
-        self._config["PASSWORD_LENGTH"] = str(length)
-        self._config["PASSWORD_SPECIAL"] = str(special).lower()
-        self._config["PASSWORD_NUMBERS"] = str(numbers).lower()
-        self._config["PASSWORD_LETTERS"] = str(letters).lower()
-        
-        # Re-read the config file and update it
-        lines = []
-        if self.config_file.exists():
-            with open(self.config_file) as f:
-                lines = f.readlines()
-        
-        # Update or add password settings
-        settings_keys = ["PASSWORD_LENGTH", "PASSWORD_SPECIAL", "PASSWORD_NUMBERS", "PASSWORD_LETTERS"]
-        updated_keys = set()
-        
-        for i, line in enumerate(lines):
-            if "=" in line and not line.strip().startswith("#"):
-                key = line.split("=", 1)[0].strip()
-                if key in settings_keys:
-                    lines[i] = f"{key}={self._config[key]}\n"
-                    updated_keys.add(key)
-        
-        # Add any missing settings
-        if updated_keys != set(settings_keys):
-            # Add them before the last line or at the end
-            new_lines = []
-            for key in settings_keys:
-                if key not in updated_keys:
-                    new_lines.append(f"{key}={self._config[key]}\n")
-            
-            if new_lines:
-                lines.extend(new_lines)
-        
-        with open(self.config_file, "w") as f:
-            f.writelines(lines)
+    def get_passphrase_wordlist(self):
+        """Get the passphrase wordlist path, or None for the system dictionary."""
+        return (self._config or {}).get("PASSPHRASE_WORDLIST") or None
+    
+    def get_clipboard_restore_delay(self):
+        """Get seconds to wait before restoring the clipboard after typing."""
+        return self.get("CLIPBOARD_RESTORE_DELAY")
+    
+    def get_paste_settle_delay(self):
+        """Get seconds to let a paste land before the clipboard takes the next text."""
+        return self.get("PASTE_SETTLE_DELAY")
+    
+    def get_autofill_totp(self):
+        """Whether autofill types the TOTP code after the login."""
+        return self.get("AUTOFILL_TOTP")
+    
+    def get_autofill_totp_delay(self):
+        """Get seconds to wait between the login and the TOTP code when autofilling."""
+        return self.get("AUTOFILL_TOTP_DELAY")
+    
+    def get_xtest_injector(self):
+        """Whether X11 pastes go through the in-process XTest backend."""
+        return self.get("XTEST_INJECTOR")
+    
+    def save_password_settings(self, length, special, numbers, letters, exclude_ambiguous=False):
+        """Save password generation settings to config file, if they changed."""
+        return self.update({
+            "PASSWORD_LENGTH": length,
+            "PASSWORD_SPECIAL": str(special).lower(),
+            "PASSWORD_NUMBERS": str(numbers).lower(),
+            "PASSWORD_LETTERS": str(letters).lower(),
+            "PASSWORD_EXCLUDE_AMBIGUOUS": str(exclude_ambiguous).lower(),
+        })
     
     def _setup(self):
         """Run configuration wizard."""
@@ -208,12 +359,13 @@ class Config:
             "rofi": "rofi (X11/Wayland)",
             "fuzzel": "fuzzel (Wayland)",
             "tofi": "tofi (Wayland)",
+            "builtin": "built-in fuzzy picker (terminal)",
         }
         
         # Check which are available
         menu_status = []
         for menu, desc in menu_options.items():
-            is_available = subprocess.run(["which", menu], capture_output=True).returncode == 0
+            is_available = menu == "builtin" or System.has_command(menu)
             menu_status.append((menu, desc, is_available))
         
         available_menus = [m for m, d, avail in menu_status if avail]
@@ -264,7 +416,7 @@ class Config:
         # Check which are available
         pinentry_status = []
         for pe in pinentry_options:
-            is_available = subprocess.run(["which", pe], capture_output=True).returncode == 0
+            is_available = System.has_command(pe)
             pinentry_status.append((pe, is_available))
         
         available_pinentry = [pe for pe, avail in pinentry_status if avail]
@@ -309,8 +461,9 @@ class Config:
 #
 
 # Menu program for displaying selections
-# Options: dmenu, bemenu, rofi, wmenu, fuzzel, tofi, auto
+# Options: dmenu, bemenu, rofi, wmenu, fuzzel, tofi, builtin, auto
 # Set to 'auto' to automatically detect available menu programs
+# 'builtin' picks in the terminal rbwm runs in, without a menu program
 MENU_CMD={menu_cmd}
 
 # Pinentry program for password prompts when unlocking vault
@@ -322,10 +475,29 @@ PASSWORD_LENGTH=16
 PASSWORD_SPECIAL=true
 PASSWORD_NUMBERS=true
 PASSWORD_LETTERS=true
+PASSWORD_MIN_PER_CLASS=1
+PASSWORD_EXCLUDE_AMBIGUOUS=false
+# Wordlist for `rbwm genpass --words N` (default: /usr/share/dict/words)
+#PASSPHRASE_WORDLIST=~/.config/rbwm/eff_large_wordlist.txt
+
+# Seconds to wait after typing before restoring the clipboard
+CLIPBOARD_RESTORE_DELAY=0.5
+# Seconds to let a paste land before the next text (the password after the
+# username) replaces it in the clipboard; raise it for slow applications
+PASTE_SETTLE_DELAY=0.15
+
+# Type the TOTP code and Enter after autofilling a login that has one,
+# waiting AUTOFILL_TOTP_DELAY seconds for the code prompt to appear
+AUTOFILL_TOTP=false
+AUTOFILL_TOTP_DELAY=1.5
+
+# Paste on X11 through libX11/libXtst inside rbwm instead of xclip/xsel and
+# xdotool. Clipboard contents too large for one X request are not saved or
+# restored, and a paste the application never reads holds rbwm for a second
+XTEST_INJECTOR=false
 """
         
-        with open(self.config_file, "w") as f:
-            f.write(config_content)
+        self._write(config_content)
         
         print(f"\nConfiguration saved to {self.config_file}")
         
@@ -337,7 +509,7 @@ PASSWORD_LETTERS=true
         wizard_menus = ["dmenu", "bemenu", "rofi", "wmenu", "fuzzel", "tofi"]
         wizard_menu = None
         for menu in wizard_menus:
-            if subprocess.run(["which", menu], capture_output=True).returncode == 0:
+            if System.has_command(menu):
                 wizard_menu = menu
                 break
         
@@ -371,7 +543,7 @@ PASSWORD_LETTERS=true
         all_menus = ["dmenu", "bemenu", "wmenu", "rofi", "fuzzel", "tofi"]
         menu_options = []
         for menu in all_menus:
-            is_available = subprocess.run(["which", menu], capture_output=True).returncode == 0
+            is_available = System.has_command(menu)
             if is_available:
                 menu_options.append(menu)
             else:
@@ -391,7 +563,7 @@ PASSWORD_LETTERS=true
         all_pinentry = ["pinentry-dmenu", "pinentry-curses", "pinentry-gnome3", "pinentry-qt", "pinentry"]
         pinentry_options = []
         for pe in all_pinentry:
-            is_available = subprocess.run(["which", pe], capture_output=True).returncode == 0
+            is_available = System.has_command(pe)
             if is_available:
                 pinentry_options.append(pe)
             else:
@@ -412,8 +584,9 @@ PASSWORD_LETTERS=true
 #
 
 # Menu program for displaying selections
-# Options: dmenu, bemenu, rofi, wmenu, fuzzel, tofi, auto
+# Options: dmenu, bemenu, rofi, wmenu, fuzzel, tofi, builtin, auto
 # Set to 'auto' to automatically detect available menu programs
+# 'builtin' picks in the terminal rbwm runs in, without a menu program
 MENU_CMD={menu_cmd}
 
 # Pinentry program for password prompts when unlocking vault
@@ -425,10 +598,29 @@ PASSWORD_LENGTH=16
 PASSWORD_SPECIAL=true
 PASSWORD_NUMBERS=true
 PASSWORD_LETTERS=true
+PASSWORD_MIN_PER_CLASS=1
+PASSWORD_EXCLUDE_AMBIGUOUS=false
+# Wordlist for `rbwm genpass --words N` (default: /usr/share/dict/words)
+#PASSPHRASE_WORDLIST=~/.config/rbwm/eff_large_wordlist.txt
+
+# Seconds to wait after typing before restoring the clipboard
+CLIPBOARD_RESTORE_DELAY=0.5
+# Seconds to let a paste land before the next text (the password after the
+# username) replaces it in the clipboard; raise it for slow applications
+PASTE_SETTLE_DELAY=0.15
+
+# Type the TOTP code and Enter after autofilling a login that has one,
+# waiting AUTOFILL_TOTP_DELAY seconds for the code prompt to appear
+AUTOFILL_TOTP=false
+AUTOFILL_TOTP_DELAY=1.5
+
+# Paste on X11 through libX11/libXtst inside rbwm instead of xclip/xsel and
+# xdotool. Clipboard contents too large for one X request are not saved or
+# restored, and a paste the application never reads holds rbwm for a second
+XTEST_INJECTOR=false
 """
         
-        with open(self.config_file, "w") as f:
-            f.write(config_content)
+        self._write(config_content)
         
         return {"MENU_CMD": menu_cmd, "PINENTRY_CMD": pinentry_cmd}
 
@@ -0,0 +1,164 @@
+"""
+Resident daemon that keeps the listing cache warm.
+
+`rbwm daemon` watches rbw's local database and, whenever it changes while
+the vault is unlocked, re-lists the vault into the on-disk listing cache
+(cache.py). A launch after a sync, or after rbwm changed an entry, then
+reads a fresh listing instead of running `rbw list` itself. `rbwm` never
+asks the daemon for anything: it holds no state, and its UNIX socket only
+answers pings, which is how a second daemon sees that one is running.
+
+The socket lives in a directory only the user can enter, and query()
+only talks to a socket owned by, and served by, the same user.
+"""
+import json
+import os
+import socket
+import stat
+import struct
+import sys
+import threading
+from pathlib import Path
+
+POLL_INTERVAL = 2.0
+CLIENT_TIMEOUT = 2.0
+
+
+def socket_path() -> Path:
+    """Get the daemon socket path."""
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime and os.path.isdir(runtime):
+        return Path(runtime) / "rbwm.sock"
+    return Path("/tmp") / f"rbwm-{os.getuid()}" / "rbwm.sock"
+
+
+def _private_dir(path):
+    """Whether a directory is owned by this user and closed to everyone else."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def _trusted_socket(path):
+    """Whether path is this user's socket in a private directory."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid() and _private_dir(path.parent)
+
+
+def _peer_uid(sock):
+    """UID of the process serving a connected UNIX socket, or None if unknown."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+
+def query(op="ping"):
+    """Send a request to the daemon and return its reply, or None if unavailable."""
+    path = socket_path()
+    if not _trusted_socket(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CLIENT_TIMEOUT)
+            sock.connect(str(path))
+            if _peer_uid(sock) not in (None, os.getuid()):
+                return None
+            sock.sendall(json.dumps({"op": op}).encode() + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+    except OSError:
+        return None
+    try:
+        reply = json.loads(b"".join(chunks))
+    except ValueError:
+        return None
+    return reply if isinstance(reply, dict) and "error" not in reply else None
+
+
+def _refresh(stamp):
+    """Re-list the vault into the listing cache if it is unlocked; returns the stamp listed."""
+    from .vault import get_entries, is_unlocked
+    
+    if not is_unlocked():
+        return None
+    get_entries()
+    return stamp
+
+
+def watch(stop):
+    """Keep the listing cache in step with rbw's database until stop is set."""
+    from . import cache
+    
+    listed = _refresh(cache.rbw_db_stamp())
+    while not stop.wait(POLL_INTERVAL):
+        stamp = cache.rbw_db_stamp()
+        if stamp is not None and stamp != listed:
+            listed = _refresh(stamp)
+
+
+def serve():
+    """Run the daemon in the foreground until interrupted."""
+    import socketserver
+    
+    path = socket_path()
+    if query("ping") is not None:
+        print(f"rbwm daemon already running on {path}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        path.parent.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        print(f"Cannot create {path.parent}: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not _private_dir(path.parent):
+        print(f"{path.parent} must be a directory owned by you with mode 0700", file=sys.stderr)
+        sys.exit(1)
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                request = json.loads(self.rfile.readline() or b"{}")
+            except ValueError:
+                request = {}
+            op = request.get("op")
+            if op == "ping":
+                reply = {"pong": True}
+            else:
+                reply = {"error": f"unknown op: {op}"}
+            self.wfile.write(json.dumps(reply).encode())
+    
+    old_umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(str(path), Handler)
+    finally:
+        os.umask(old_umask)
+    
+    stop = threading.Event()
+    threading.Thread(target=watch, args=(stop,), daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,25 @@
+"""
+Non-interactive $EDITOR for `rbw edit`.
+
+rbw runs `$EDITOR FILE`; vault.edit_entry sets EDITOR to
+`python editor.py FD`, where FD is the read end of a pipe rbwm keeps
+writing the new contents to. This script copies the pipe into FILE, so the
+new password and notes never touch the command line or the environment.
+
+Run as a plain script, so it imports nothing from rbwm.
+"""
+import os
+import sys
+
+
+def main(argv):
+    fd = int(argv[1])
+    path = argv[-1]
+    with os.fdopen(fd, "rb") as source:
+        contents = source.read()
+    with open(path, "wb") as f:
+        f.write(contents)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,171 @@
+"""Compact vault entry records and a display-indexed table of them."""
+import re
+
+# Second-level labels under which registrations happen (example.co.uk)
+_SLD_LABELS = {"ac", "co", "com", "edu", "gov", "net", "org"}
+_HOST_RE = re.compile(r"[a-z0-9-]+(?:\.[a-z0-9-]+)+")
+
+
+def registrable_domain(uri):
+    """Reduce a URI or hostname to its registrable domain ("" if none).
+    
+    This is an approximation of the public suffix rules: the last two
+    labels, or three under a short ccTLD with a common second-level label.
+    """
+    from urllib.parse import urlsplit
+    
+    uri = uri.strip().lower()
+    if not uri:
+        return ""
+    host = urlsplit(uri if "://" in uri else "//" + uri).hostname or ""
+    labels = [label for label in host.split(".") if label]
+    if len(labels) < 2 or labels[-1].isdigit():
+        return host
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SLD_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+class Entry:
+    """One item from `rbw list`, without secrets."""
+    
+    __slots__ = ("display", "id", "name", "user", "folder", "type", "domains")
+    
+    def __init__(self, display, id="", name="", user="", folder="", type="", domains=()):
+        self.display = display
+        self.id = id
+        self.name = name
+        self.user = user
+        self.folder = folder
+        self.type = type
+        self.domains = tuple(domains)
+    
+    @classmethod
+    def from_item(cls, item):
+        """Build an entry from one `rbw list --raw` item."""
+        name = item.get("name") or ""
+        user = item.get("user") or ""
+        folder = item.get("folder") or ""
+        display = name
+        if user:
+            display += f" ({user})"
+        if folder:
+            display += f" [{folder}]"
+        domains = []
+        for uri in item.get("uris") or []:
+            domain = registrable_domain(uri.get("uri") or "" if isinstance(uri, dict) else uri)
+            if domain and domain not in domains:
+                domains.append(domain)
+        return cls(display, item.get("id") or "", name, user, folder, item.get("type") or "", domains)
+    
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: data.get(k) or ("" if k != "domains" else ()) for k in cls.__slots__})
+    
+    def to_dict(self):
+        data = {k: getattr(self, k) for k in self.__slots__}
+        data["domains"] = list(self.domains)
+        return data
+    
+    @property
+    def is_note(self):
+        return self.type == "Note"
+    
+    def __repr__(self):
+        return f"Entry({self.display!r})"
+
+
+class EntryTable:
+    """Entries with per-type views, a display string → entry index and a
+    registrable domain → logins index.
+    
+    Every menu line must map back to exactly one entry, so an entry whose
+    display string is already taken gets its short ID appended.
+    """
+    
+    def __init__(self, entries=()):
+        self._entries = []
+        self._by_display = {}
+        self._by_domain = {}
+        self.logins = []
+        self.notes = []
+        for entry in entries:
+            self.add(entry)
+    
+    @classmethod
+    def from_dicts(cls, items):
+        return cls(Entry.from_dict(item) for item in items)
+    
+    def add(self, entry):
+        """Index an entry, disambiguating its display string if needed."""
+        if entry.display in self._by_display:
+            base = f"{entry.display} <{entry.id[:8]}>" if entry.id else entry.display
+            display = base
+            n = 2
+            while display in self._by_display:
+                display = f"{base} #{n}"
+                n += 1
+            entry.display = display
+        
+        self._entries.append(entry)
+        self._by_display[entry.display] = entry
+        (self.notes if entry.is_note else self.logins).append(entry)
+        if not entry.is_note:
+            for domain in entry.domains:
+                self._by_domain.setdefault(domain, []).append(entry)
+        return entry
+    
+    def find(self, display):
+        """Get the entry shown as `display`, or None."""
+        return self._by_display.get(display)
+    
+    def matching_title(self, title):
+        """Logins whose name appears in a window title, longest name first."""
+        title = title.lower()
+        if not title:
+            return []
+        matches = [e for e in self.logins if len(e.name) >= 3 and e.name.lower() in title]
+        matches.sort(key=lambda e: len(e.name), reverse=True)
+        return matches
+    
+    def match_domain(self, uri):
+        """Logins saved for the registrable domain of a URI or hostname."""
+        return list(self._by_domain.get(registrable_domain(uri), ()))
+    
+    def match_window(self, title):
+        """Logins for a window title: by hostnames in it, else by entry name."""
+        matches = []
+        for host in _HOST_RE.findall(title.lower()):
+            for entry in self.match_domain(host):
+                if entry not in matches:
+                    matches.append(entry)
+        return matches or self.matching_title(title)
+    
+    def search(self, query="", folder=None, type=None):
+        """Entries matching every term of query, optionally in one folder and of one type.
+        
+        Terms match case-insensitively anywhere in the name, username or a
+        saved domain. Without a type, notes are left out as in the main menu;
+        folder "" means entries outside any folder.
+        """
+        terms = query.lower().split()
+        pool = self._entries if type else self.logins
+        matches = []
+        for entry in pool:
+            if type and entry.type.lower() != type.lower():
+                continue
+            if folder is not None and entry.folder.lower() != folder.lower():
+                continue
+            text = " ".join((entry.name, entry.user) + entry.domains).lower()
+            if all(term in text for term in terms):
+                matches.append(entry)
+        return matches
+    
+    def to_dicts(self):
+        return [entry.to_dict() for entry in self._entries]
+    
+    def __iter__(self):
+        return iter(self._entries)
+    
+    def __len__(self):
+        return len(self._entries)
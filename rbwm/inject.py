@@ -1,49 +1,290 @@
 """Text injection via clipboard and keyboard simulation."""
 import subprocess
 import os
+import time
+from abc import ABC, abstractmethod
+
+from . import trace
+
+
+class Injector(ABC):
+    """A clipboard + key-sending backend.
+    
+    Capability flags let callers pick the cheapest path a backend supports.
+    """
+    name = ""
+    display = ""            # "wayland" or "x11"
+    requires = ()           # Commands that must be on PATH
+    selections = []         # Selections written before each paste
+    can_type = False        # Types text directly, without the clipboard
+    can_chord = False       # Sends modifier chords such as shift+Insert
+    can_batch = False       # Sends a paste and further keys in one process
+    confirms_paste = False  # send_keys returns once the paste has been read
+    
+    @classmethod
+    def available(cls):
+        from .system import System
+        
+        return all(System.has_command(cmd) for cmd in cls.requires)
+    
+    @abstractmethod
+    def read_selection(self, selection):
+        """Current text of a selection."""
+    
+    @abstractmethod
+    def write_command(self, selection):
+        """Command that sets a selection from stdin."""
+    
+    def write_selection(self, selection, text):
+        subprocess.run(self.write_command(selection), input=text, text=True)
+    
+    def restore_later(self, selection, text, delay):
+        """Set a selection after a delay from a detached helper process."""
+        import shlex
+        
+        helper = subprocess.Popen(
+            ["sh", "-c", f"sleep {delay:g}; exec {shlex.join(self.write_command(selection))}"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            text=True
+        )
+        try:
+            helper.stdin.write(text)
+            helper.stdin.close()
+        except BrokenPipeError:
+            pass
+    
+    @abstractmethod
+    def send_keys(self, keys, paste=False):
+        """Send an optional Shift+Insert paste followed by keys."""
+    
+    def type_direct(self, text):
+        """Type text as key events; only called on backends with can_type."""
+        raise NotImplementedError(f"{self.name} cannot type text directly")
+
+
+class WaylandInjector(Injector):
+    name = "wl-clipboard"
+    display = "wayland"
+    requires = ("wl-copy", "wl-paste", "wtype")
+    selections = [["--primary"]]
+    can_type = can_chord = can_batch = True
+    
+    def read_selection(self, selection):
+        return subprocess.run(["wl-paste"] + selection, capture_output=True, text=True).stdout
+    
+    def write_command(self, selection):
+        return ["wl-copy"] + selection
+    
+    def send_keys(self, keys, paste=False):
+        cmd = ["wtype"]
+        if paste:
+            cmd += ["-M", "shift", "-k", "Insert", "-m", "shift"]
+        for key in keys:
+            cmd += ["-k", key]
+        subprocess.run(cmd)
+    
+    def type_direct(self, text):
+        subprocess.run(["wtype", "-"], input=text, text=True)
+
+
+class XdotoolInjector(Injector):
+    display = "x11"
+    can_type = can_chord = can_batch = True
+    
+    def send_keys(self, keys, paste=False):
+        subprocess.run(["xdotool", "key"] + (["shift+Insert"] if paste else []) + list(keys))
+    
+    def type_direct(self, text):
+        subprocess.run(["xdotool", "type", "--clearmodifiers", "--file", "-"], input=text, text=True)
+
+
+class XclipInjector(XdotoolInjector):
+    name = "xclip"
+    requires = ("xclip", "xdotool")
+    selections = [["-selection", "primary"], ["-selection", "clipboard"]]
+    
+    def read_selection(self, selection):
+        return subprocess.run(["xclip"] + selection + ["-o"], capture_output=True, text=True).stdout
+    
+    def write_command(self, selection):
+        return ["xclip"] + selection
+
+
+class XselInjector(XdotoolInjector):
+    name = "xsel"
+    requires = ("xsel", "xdotool")
+    selections = [["-p"], ["-b"]]
+    
+    def read_selection(self, selection):
+        return subprocess.run(["xsel"] + selection + ["-o"], capture_output=True, text=True).stdout
+    
+    def write_command(self, selection):
+        return ["xsel"] + selection + ["-i"]
+
+
+# In order of preference per display server
+INJECTORS = [WaylandInjector, XclipInjector, XselInjector]
+
+
+def _registry():
+    """All injector backends, with the in-process one if XTEST_INJECTOR is set."""
+    from .config import CONFIG
+    
+    if not CONFIG.get_xtest_injector():
+        return list(INJECTORS)
+    from .xtest import XTestInjector
+    
+    return [WaylandInjector, XTestInjector] + INJECTORS[1:]
+
+
+_injector = None
+
+# Selection contents from before the last paste, and when their restore runs
+_saved = None
+_restore_at = 0.0
+
+
+def get_injector():
+    """Resolve the injector backend once per session.
+    
+    The choice is remembered by tool discovery, keyed by display type and
+    PATH, so later runs skip probing.
+    """
+    global _injector
+    if _injector is not None:
+        return _injector
+    
+    from .system import System
+    
+    registry = _registry()
+    display = "wayland" if os.environ.get("WAYLAND_DISPLAY") else "x11"
+    choice_key = "injector:" + ",".join(cls.name for cls in registry)
+    by_name = {cls.name: cls for cls in registry}
+    cls = by_name.get(System.recall(choice_key))
+    if cls is None or cls.display != display:
+        candidates = [c for c in registry if c.display == display]
+        cls = next((c for c in candidates if c.available()), candidates[-1])
+        System.remember(choice_key, cls.name)
+    
+    try:
+        _injector = cls()
+    except OSError:
+        # In-process backend could not connect; use the next available one
+        fallback = [c for c in registry if c.display == cls.display and c is not cls]
+        _injector = next((c for c in fallback if c.available()), fallback[-1])()
+    return _injector
+
+
+def _save_clipboard(injector):
+    """Save the selections before a paste.
+    
+    While an earlier restore is still pending they hold text rbwm pasted,
+    so the contents saved before that paste are kept instead.
+    """
+    global _saved
+    if _saved is None or time.monotonic() >= _restore_at:
+        _saved = [injector.read_selection(sel) for sel in injector.selections]
+
+
+def restore_clipboard():
+    """Hand the saved selections to detached helpers that restore them.
+    
+    Restoring after CLIPBOARD_RESTORE_DELAY seconds, rather than right
+    after the paste keystroke, leaves the target application time to read
+    the pasted text.
+    """
+    global _restore_at
+    if _saved is None:
+        return
+    from .config import CONFIG
+    
+    injector = get_injector()
+    delay = CONFIG.get_clipboard_restore_delay()
+    with trace.span("restore", delay=delay):
+        for sel, original in zip(injector.selections, _saved):
+            injector.restore_later(sel, original, delay)
+    _restore_at = time.monotonic() + delay
+
+
+def type_sequence(steps, direct=False):
+    """Type a sequence of ("text", value) and ("key", keysym) steps.
+    
+    The clipboard is saved before the first paste and restored in the
+    background once the sequence is typed, one save/restore cycle per
+    call. On backends that batch, each paste is sent together with the
+    keys that follow it. With direct=True, meant for short ASCII such as
+    TOTP codes, text is typed as key events instead of pasted where the
+    backend supports it; so is all text on backends that cannot send the
+    paste chord.
+    """
+    with trace.span("inject", steps=len(steps)):
+        _type_sequence(steps, direct)
+
+
+def _type_sequence(steps, direct):
+    injector = get_injector()
+    direct = injector.can_type and (direct or not injector.can_chord)
+    has_text = any(kind == "text" for kind, _ in steps)
+    selections = injector.selections if has_text and not direct else []
+    if selections:
+        _save_clipboard(injector)
+    
+    try:
+        _send_steps(injector, steps, selections, direct)
+    finally:
+        if selections:
+            restore_clipboard()
+
+
+def _send_steps(injector, steps, selections, direct):
+    from .config import CONFIG
+    
+    paste = False
+    keys = []
+    
+    def flush():
+        if injector.can_batch:
+            if keys or paste:
+                injector.send_keys(keys, paste)
+        else:
+            if paste:
+                injector.send_keys([], paste=True)
+            for key in keys:
+                injector.send_keys([key])
+    
+    for kind, value in steps:
+        if kind == "key":
+            keys.append(value)
+            continue
+        flush()
+        keys = []
+        if direct:
+            injector.type_direct(value)
+            paste = False
+            continue
+        if paste and not injector.confirms_paste:
+            # The application may still be reading the previous paste; the
+            # password must not land in the username field
+            time.sleep(CONFIG.get_paste_settle_delay())
+        for sel in selections:
+            injector.write_selection(sel, value)
+        paste = True
+    flush()
 
 
 def type_text(text):
     """Type text by copying to clipboard and pasting."""
-    wayland = os.environ.get("WAYLAND_DISPLAY")
-    if wayland:
-        original = subprocess.run(["wl-paste", "--primary"], capture_output=True, text=True).stdout
-        subprocess.run(["wl-copy", "--primary"], input=text, text=True)
-        subprocess.run(["wtype", "-M", "shift", "-k", "Insert", "-m", "shift"])
-        subprocess.run(["wl-copy", "--primary"], input=original, text=True)
-    else:
-        has_xclip = subprocess.run(["which", "xclip"], capture_output=True).returncode == 0
-        if has_xclip:
-            original_primary = subprocess.run(["xclip", "-selection", "primary", "-o"], capture_output=True, text=True).stdout
-            original_clipboard = subprocess.run(["xclip", "-selection", "clipboard", "-o"], capture_output=True, text=True).stdout
-            subprocess.run(["xclip", "-selection", "primary"], input=text, text=True)
-            subprocess.run(["xclip", "-selection", "clipboard"], input=text, text=True)
-            subprocess.run(["xdotool", "key", "shift+Insert"])
-            subprocess.run(["xclip", "-selection", "primary"], input=original_primary, text=True)
-            subprocess.run(["xclip", "-selection", "clipboard"], input=original_clipboard, text=True)
-        else:
-            original_primary = subprocess.run(["xsel", "-p", "-o"], capture_output=True, text=True).stdout
-            original_clipboard = subprocess.run(["xsel", "-b", "-o"], capture_output=True, text=True).stdout
-            subprocess.run(["xsel", "-p", "-i"], input=text, text=True)
-            subprocess.run(["xsel", "-b", "-i"], input=text, text=True)
-            subprocess.run(["xdotool", "key", "shift+Insert"])
-            subprocess.run(["xsel", "-p", "-i"], input=original_primary, text=True)
-            subprocess.run(["xsel", "-b", "-i"], input=original_clipboard, text=True)
+    type_sequence([("text", text)])
 
 
 def press_tab():
     """Press Tab key."""
-    wayland = os.environ.get("WAYLAND_DISPLAY")
-    if wayland:
-        subprocess.run(["wtype", "-k", "Tab"])
-    else:
-        subprocess.run(["xdotool", "key", "Tab"])
+    type_sequence([("key", "Tab")])
 
 
 def press_enter():
     """Press Enter key."""
-    wayland = os.environ.get("WAYLAND_DISPLAY")
-    if wayland:
-        subprocess.run(["wtype", "-k", "Return"])
-    else:
-        subprocess.run(["xdotool", "key", "Return"])
+    type_sequence([("key", "Return")])
@@ -3,10 +3,16 @@ Menu abstraction for different menu programs.
 """
 import subprocess
 
+from . import trace
+
 
 MENU_CONFIGS = {
     "dmenu": {
         "cmd": "dmenu -l 10 -i -p '{prompt}'",
+        # Ctrl+Return prints the highlighted item and keeps the menu open;
+        # Return prints it and exits, Escape exits with status 1 after the
+        # marked items were already printed
+        "multi_cmd": "dmenu -l 10 -i -p '{prompt} (Ctrl+Return: mark, Esc: done)'",
         "description": "Classic dmenu (X11)"
     },
     "bemenu": {
@@ -19,6 +25,7 @@ MENU_CONFIGS = {
     },
     "rofi": {
         "cmd": "rofi -dmenu -i -p '{prompt}'",
+        "multi_cmd": "rofi -dmenu -multi-select -i -p '{prompt}'",
         "description": "rofi (X11/Wayland)"
     },
     "fuzzel": {
@@ -29,22 +36,137 @@ MENU_CONFIGS = {
         "cmd": "tofi --prompt '{prompt}'",
         "description": "tofi (Wayland)"
     },
+    # Shown in the terminal by rbwm itself (picker.py); Tab marks items
+    "builtin": {
+        "builtin": True,
+        "description": "Built-in fuzzy picker (terminal)"
+    },
 }
 
 
+# First item of the repeated-selection fallback for menus without multi-select
+SELECT_SEVERAL = "[Select several...]"
+DONE = "[Done]"
+MARK = "* "
+
+
+def is_builtin(menu_cmd):
+    """Whether menu_cmd names rbwm's own terminal picker."""
+    return MENU_CONFIGS.get(menu_cmd, {}).get("builtin", False)
+
+
+def build_menu_cmd(menu_cmd, prompt, multi=False):
+    """Expand a menu program name (or custom command) into a shell command."""
+    config = MENU_CONFIGS.get(menu_cmd, {})
+    cmd_template = config.get("multi_cmd" if multi else "cmd", menu_cmd)
+    return cmd_template.format(prompt=prompt)
+
+
+class MenuProcess:
+    """A menu started before all of its items are known.
+    
+    Items are written to the menu's stdin as they become available;
+    `choose()` closes the input and waits for the selection.
+    """
+    
+    def __init__(self, menu_cmd, prompt="Select"):
+        self._span = trace.span("menu", streamed=True)
+        self._items = 0
+        self._proc = subprocess.Popen(
+            build_menu_cmd(menu_cmd, prompt),
+            shell=True,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True
+        )
+    
+    def add(self, items):
+        """Append items to the menu."""
+        try:
+            for item in items:
+                self._proc.stdin.write(item + "\n")
+                self._items += 1
+            self._proc.stdin.flush()
+        except BrokenPipeError:
+            pass  # Menu already closed, choose() will report it
+    
+    def choose(self):
+        """Finish input and return the selection, or None if cancelled."""
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        output = self._proc.stdout.read()
+        self._proc.stdout.close()
+        chosen = self._proc.wait() == 0
+        self._span.end(items=self._items, chosen=chosen)
+        return output.strip() if chosen else None
+    
+    def cancel(self):
+        """Close the menu without a selection."""
+        self._proc.kill()
+        self._proc.wait()
+        self._span.end(items=self._items, cancelled=True)
+        for stream in (self._proc.stdin, self._proc.stdout):
+            try:
+                stream.close()
+            except BrokenPipeError:
+                pass
+
+
+class BuiltinMenu:
+    """MenuProcess counterpart for the builtin picker.
+    
+    The picker runs in this process, so items are collected and shown
+    once `choose()` is called.
+    """
+    
+    def __init__(self, prompt="Select"):
+        self._prompt = prompt
+        self._items = []
+    
+    def add(self, items):
+        """Append items to the menu."""
+        self._items.extend(items)
+    
+    def choose(self):
+        """Show the picker and return the selection, or None if cancelled."""
+        from .picker import pick
+        
+        return pick(self._items, self._prompt)
+    
+    def cancel(self):
+        """Drop the menu without showing it."""
+        self._items = []
+
+
+def open_menu(prompt="Select"):
+    """Start the configured menu and return a MenuProcess to feed it."""
+    from .config import CONFIG
+    
+    menu_cmd = CONFIG.get_menu_cmd()
+    if is_builtin(menu_cmd):
+        return BuiltinMenu(prompt)
+    return MenuProcess(menu_cmd, prompt)
+
+
 def select_from_menu_raw(menu_cmd, items, prompt="Select"):
     """Show menu using specific menu command without config."""
-    cmd_template = MENU_CONFIGS.get(menu_cmd, {}).get("cmd", menu_cmd)
-    cmd = cmd_template.format(prompt=prompt)
+    if is_builtin(menu_cmd):
+        from .picker import pick
+        return pick(items or [], prompt)
+    
+    cmd = build_menu_cmd(menu_cmd, prompt)
     
     input_text = "\n".join(items) if items else ""
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        input=input_text,
-        capture_output=True,
-        text=True
-    )
+    with trace.span("menu", items=len(items) if items else 0):
+        result = subprocess.run(
+            cmd,
+            shell=True,
+            input=input_text,
+            capture_output=True,
+            text=True
+        )
     return result.stdout.strip() if result.returncode == 0 else None
 
 
@@ -61,15 +183,74 @@ def prompt_for_input(prompt="Enter value"):
     from .config import CONFIG
     
     menu_cmd = CONFIG.get_menu_cmd()
-    cmd_template = MENU_CONFIGS.get(menu_cmd, {}).get("cmd", menu_cmd)
-    cmd = cmd_template.format(prompt=prompt)
+    if is_builtin(menu_cmd):
+        from .picker import pick
+        return pick([], prompt)
+    
+    cmd = build_menu_cmd(menu_cmd, prompt)
     
     # Empty input allows user to type freely
-    result = subprocess.run(
-        cmd,
-        shell=True,
-        input="",
-        capture_output=True,
-        text=True
-    )
+    with trace.span("menu", items=0):
+        result = subprocess.run(
+            cmd,
+            shell=True,
+            input="",
+            capture_output=True,
+            text=True
+        )
     return result.stdout.strip() if result.returncode == 0 else None
+
+
+def select_many_from_menu(items, prompt="Select"):
+    """Show menu with items and return the list of selections ([] if cancelled).
+    
+    Menus with multi-select return all marked items in one pass. Others
+    get a repeated-selection fallback: picking an item right away selects
+    just that one, while SELECT_SEVERAL opens a menu that toggles items
+    until DONE.
+    """
+    from .config import CONFIG
+    
+    menu_cmd = CONFIG.get_menu_cmd()
+    known = set(items)
+    if is_builtin(menu_cmd):
+        from .picker import pick
+        return pick(items, prompt, multi=True)
+    if "multi_cmd" in MENU_CONFIGS.get(menu_cmd, {}):
+        with trace.span("menu", items=len(items), multi=True):
+            result = subprocess.run(
+                build_menu_cmd(menu_cmd, prompt, multi=True),
+                shell=True,
+                input="\n".join(items),
+                capture_output=True,
+                text=True
+            )
+        # Items printed before a non-zero exit were marked before the menu
+        # was left with Escape, so they still count
+        return list(dict.fromkeys(line for line in result.stdout.splitlines() if line in known))
+    
+    choice = select_from_menu_raw(menu_cmd, [SELECT_SEVERAL] + list(items), prompt)
+    if not choice:
+        return []
+    if choice != SELECT_SEVERAL:
+        return [choice] if choice in known else []
+    
+    selected = set()
+    while True:
+        lines = [f"{DONE} ({len(selected)} selected)"]
+        lines += [MARK + item if item in selected else item for item in items]
+        choice = select_from_menu_raw(menu_cmd, lines, prompt)
+        if not choice:
+            return []
+        if choice == lines[0]:
+            return [item for item in items if item in selected]
+        item = choice[len(MARK):] if choice.startswith(MARK) and choice[len(MARK):] in selected else choice
+        if item in selected:
+            selected.discard(item)
+        elif item in known:
+            selected.add(item)
+
+
+def confirm(prompt):
+    """Ask a yes/no question; only an explicit "Yes" counts."""
+    return select_from_menu(["No", "Yes"], prompt) == "Yes"
@@ -1,26 +1,112 @@
-"""Password generation utilities."""
-import random
+"""Password generation utilities.
+
+Characters are drawn from `secrets` in bulk: random bytes are mapped onto
+the character set with one bytes.translate() call, which also deletes the
+bytes that would bias the result (rejection sampling), so generating many
+long passwords stays fast.
+"""
+import secrets
 import string
 
+AMBIGUOUS = "Il1O0o|`'\""
+DEFAULT_WORDLISTS = ("/usr/share/dict/words",)
 
-def generate_password(length=16, special=True, numbers=True, letters=True):
-    """Generate a random password with specified characteristics."""
-    if length < 1:
-        length = 1
-    
-    charset = ""
+# Wordlist path -> words, loaded once per process
+_wordlists = {}
+
+
+def _classes(special, numbers, letters, exclude_ambiguous):
+    """Enabled character classes, letters if none are."""
+    classes = []
     if letters:
-        charset += string.ascii_letters
+        classes.append(string.ascii_letters)
     if numbers:
-        charset += string.digits
+        classes.append(string.digits)
     if special:
-        charset += string.punctuation
+        classes.append(string.punctuation)
+    if not classes:
+        classes.append(string.ascii_letters)
+    if exclude_ambiguous:
+        classes = ["".join(c for c in chars if c not in AMBIGUOUS) for chars in classes]
+    return classes
+
+
+def sample(charset, count):
+    """`count` characters drawn uniformly and independently from an ASCII charset."""
+    n = len(charset)
+    limit = 256 - 256 % n
+    table = bytes(ord(charset[b % n]) if b < limit else 0 for b in range(256))
+    reject = bytes(range(limit, 256))
+    out = b""
+    while len(out) < count:
+        # Over-draw by the expected rejection rate plus some slack
+        need = count - len(out)
+        out += secrets.token_bytes(need * 256 // limit + 16).translate(table, reject)
+    return out[:count].decode("ascii")
+
+
+def generate_passwords(count, length=16, special=True, numbers=True, letters=True,
+                       min_per_class=1, exclude_ambiguous=False):
+    """Generate `count` passwords in one batch.
     
-    # If no charset selected, default to letters
-    if not charset:
-        charset = string.ascii_letters
+    Every enabled class appears at least `min_per_class` times: those
+    characters are drawn from their class and put at random positions,
+    the rest come from the union of all enabled classes.
+    """
+    length = max(1, length)
+    classes = _classes(special, numbers, letters, exclude_ambiguous)
+    required = max(0, min_per_class) * len(classes)
+    if required > length:
+        raise ValueError(f"length {length} is too short for {min_per_class} of each of {len(classes)} character classes")
     
-    return ''.join(random.choice(charset) for _ in range(length))
+    body = sample("".join(classes), count * (length - required))
+    forced = [sample(chars, count * min_per_class) for chars in classes] if required else []
+    
+    passwords = []
+    rest = length - required
+    for i in range(count):
+        chars = list(body[i * rest:(i + 1) * rest])
+        for pool in forced:
+            for c in pool[i * min_per_class:(i + 1) * min_per_class]:
+                chars.insert(secrets.randbelow(len(chars) + 1), c)
+        passwords.append("".join(chars))
+    return passwords
+
+
+def generate_password(length=16, special=True, numbers=True, letters=True,
+                      min_per_class=1, exclude_ambiguous=False):
+    """Generate a random password with specified characteristics."""
+    return generate_passwords(1, length, special, numbers, letters, min_per_class, exclude_ambiguous)[0]
+
+
+def load_wordlist(path=None):
+    """Words for passphrases, from `path` or the system dictionary (cached).
+    
+    Diceware lists ("11111<TAB>abacus") and plain one-word-per-line files
+    both work.
+    """
+    import os
+    
+    paths = [os.path.expanduser(path)] if path else list(DEFAULT_WORDLISTS)
+    for candidate in paths:
+        if candidate in _wordlists:
+            return _wordlists[candidate]
+        try:
+            with open(candidate, encoding="utf-8", errors="replace") as f:
+                words = {line.split()[-1] for line in f if line.strip()}
+        except OSError:
+            continue
+        words = sorted(w for w in words if w.isalpha() and w.islower() and 3 <= len(w) <= 9)
+        if words:
+            _wordlists[candidate] = words
+            return words
+    raise ValueError("no passphrase wordlist found" + (f" at {path}" if path else ""))
+
+
+def generate_passphrase(words=6, separator="-", wordlist=None):
+    """Generate a diceware-style passphrase of random words."""
+    vocabulary = load_wordlist(wordlist)
+    return separator.join(vocabulary[secrets.randbelow(len(vocabulary))] for _ in range(max(1, words)))
 
 
 def password_menu():
@@ -50,6 +136,7 @@ def password_menu():
             f"Special characters: {'Yes' if settings['special'] else 'No'}",
             f"Numbers: {'Yes' if settings['numbers'] else 'No'}",
             f"Letters: {'Yes' if settings['letters'] else 'No'}",
+            f"Exclude ambiguous: {'Yes' if settings['exclude_ambiguous'] else 'No'}",
         ]
         
         setting_choice = select_from_menu(menu_items, "Password generation settings")
@@ -58,18 +145,25 @@ def password_menu():
             return None
         
         if setting_choice == "[Generate]":
-            password = generate_password(
-                length=settings['length'],
-                special=settings['special'],
-                numbers=settings['numbers'],
-                letters=settings['letters']
-            )
+            try:
+                password = generate_password(
+                    length=settings['length'],
+                    special=settings['special'],
+                    numbers=settings['numbers'],
+                    letters=settings['letters'],
+                    min_per_class=settings['min_per_class'],
+                    exclude_ambiguous=settings['exclude_ambiguous']
+                )
+            except ValueError as e:
+                select_from_menu(["Ok"], str(e))
+                continue
             # Save settings for future use
             CONFIG.save_password_settings(
                 settings['length'],
                 settings['special'],
                 settings['numbers'],
-                settings['letters']
+                settings['letters'],
+                settings['exclude_ambiguous']
             )
             return password
         
@@ -90,3 +184,54 @@ def password_menu():
         
         elif setting_choice.startswith("Letters:"):
             settings['letters'] = not settings['letters']
+        
+        elif setting_choice.startswith("Exclude ambiguous:"):
+            settings['exclude_ambiguous'] = not settings['exclude_ambiguous']
+
+
+def run(argv):
+    """Entry point for `rbwm genpass`; prints passwords one per line."""
+    import argparse
+    import sys
+    from .config import CONFIG
+    
+    # Defaults come from the config file when there is one
+    settings = {"length": 16, "special": True, "numbers": True, "letters": True,
+                "min_per_class": 1, "exclude_ambiguous": False}
+    wordlist = None
+    if CONFIG.config_file.exists():
+        CONFIG.load()
+        for error in CONFIG.errors:
+            print(f"config: {error}, using the default", file=sys.stderr)
+        settings = CONFIG.get_password_settings()
+        wordlist = CONFIG.get_passphrase_wordlist()
+    
+    parser = argparse.ArgumentParser(prog="rbwm genpass")
+    parser.add_argument("-n", "--count", type=int, default=1, help="number of passwords")
+    parser.add_argument("-l", "--length", type=int, default=settings["length"])
+    parser.add_argument("--no-special", dest="special", action="store_false", default=settings["special"])
+    parser.add_argument("--no-numbers", dest="numbers", action="store_false", default=settings["numbers"])
+    parser.add_argument("--no-letters", dest="letters", action="store_false", default=settings["letters"])
+    parser.add_argument("--min-per-class", type=int, default=settings["min_per_class"],
+                        help="minimum characters from each enabled class")
+    parser.add_argument("--exclude-ambiguous", action="store_true", default=settings["exclude_ambiguous"],
+                        help=f"leave out {AMBIGUOUS}")
+    parser.add_argument("-w", "--words", type=int, metavar="N", help="generate passphrases of N words instead")
+    parser.add_argument("--separator", default="-", help="passphrase word separator")
+    parser.add_argument("--wordlist", default=wordlist, help="passphrase wordlist (diceware or one word per line)")
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.words:
+            load_wordlist(args.wordlist)
+            results = [generate_passphrase(args.words, args.separator, args.wordlist)
+                       for _ in range(max(0, args.count))]
+        else:
+            results = generate_passwords(max(0, args.count), args.length, args.special, args.numbers,
+                                         args.letters, args.min_per_class, args.exclude_ambiguous)
+    except ValueError as e:
+        print(f"rbwm genpass: {e}", file=sys.stderr)
+        return 1
+    if results:
+        sys.stdout.write("\n".join(results) + "\n")
+    return 0
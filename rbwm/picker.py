@@ -0,0 +1,327 @@
+"""
+Built-in fuzzy picker for terminals, SSH sessions and setups without a
+graphical menu (MENU_CMD=builtin).
+
+Items are lowercased once into an Index, cached for as long as the same
+item list (the vault snapshot) is shown again. Every finished search is
+kept, so a keystroke that extends the query only re-scores the matches of
+the query before it, and backspace is a lookup. Searches run in time-boxed
+slices between keystrokes, so typing never waits for a full pass.
+
+Space-separated terms must all match as subsequences of an item, case
+insensitively. Items matching every term as a substring come first, each
+group in the original (frecency) order.
+"""
+import os
+import re
+import time
+from itertools import compress
+
+# Longest a search may hold up the input loop, in seconds
+SLICE = 0.004
+# Candidates scored between two checks of the slice deadline
+CHUNK = 2048
+
+
+class Search:
+    """Matches for one query, computed a slice at a time."""
+    
+    def __init__(self, index, query, source):
+        self.index = index
+        self.query = query
+        self.exact = []
+        self.fuzzy = []
+        self._source = source
+        self._pos = 0
+        terms = query.lower().split()
+        self._subsequence = [_subsequence_pattern(term).search for term in terms]
+        self._substring = [re.compile(re.escape(term)).search for term in terms if len(term) > 1]
+    
+    @property
+    def done(self):
+        return self._pos >= len(self._source)
+    
+    def __len__(self):
+        return len(self.exact) + len(self.fuzzy)
+    
+    def __getitem__(self, i):
+        return self.exact[i] if i < len(self.exact) else self.fuzzy[i - len(self.exact)]
+    
+    def run(self, seconds=SLICE):
+        """Score candidates for up to `seconds`; returns whether the search is done."""
+        if self.done:
+            return True
+        deadline = time.perf_counter() + seconds
+        lowered = self.index.lowered.__getitem__
+        while not self.done:
+            ids = self._source[self._pos:self._pos + CHUNK]
+            self._pos += len(ids)
+            for search in self._subsequence:
+                ids = list(compress(ids, map(search, map(lowered, ids))))
+            exact = ids
+            for search in self._substring:
+                exact = list(compress(exact, map(search, map(lowered, exact))))
+            self.exact += exact
+            if len(exact) < len(ids):
+                exact = set(exact)
+                self.fuzzy += [i for i in ids if i not in exact]
+            if time.perf_counter() >= deadline:
+                break
+        if self.done:
+            self.index.finished(self)
+        return self.done
+
+
+def _subsequence_pattern(term):
+    """Regex finding the characters of term in order, without backtracking."""
+    parts = [re.escape(term[0])]
+    for char in term[1:]:
+        char = re.escape(char)
+        parts.append(f"[^{char}]*{char}")
+    return re.compile("".join(parts))
+
+
+class Index:
+    """Lowercased items and the finished searches over them."""
+    
+    def __init__(self, items):
+        self.items = items
+        self.lowered = [item.lower() for item in items]
+        self._finished = {}
+    
+    def search(self, query):
+        """A Search for query, narrowed from the longest finished search it extends."""
+        key = " ".join(query.lower().split())
+        if key in self._finished:
+            return self._finished[key]
+        if not key:
+            search = Search(self, key, [])
+            search.exact = list(range(len(self.items)))
+            self._finished[key] = search
+            return search
+        
+        source = None
+        for previous in sorted(self._finished, key=len, reverse=True):
+            if previous and _narrows(previous, key):
+                found = self._finished[previous]
+                # Both tiers are in item order; merge them back into it so the
+                # narrowed search keeps the original order within its tiers
+                source = sorted(found.exact + found.fuzzy)
+                break
+        if source is None:
+            source = range(len(self.items))
+        return Search(self, key, source)
+    
+    def finished(self, search):
+        # Keep only the searches the current query can still narrow from
+        self._finished = {q: s for q, s in self._finished.items() if _narrows(q, search.query)}
+        self._finished[search.query] = search
+
+
+def _narrows(previous, query):
+    """Whether every match of query is also a match of previous."""
+    terms, previous_terms = query.split(), previous.split()
+    if not previous_terms:
+        return True
+    return (len(terms) >= len(previous_terms)
+            and terms[:len(previous_terms) - 1] == previous_terms[:-1]
+            and terms[len(previous_terms) - 1].startswith(previous_terms[-1]))
+
+
+_index = None
+
+
+def get_index(items):
+    """The Index for items, reused while the same list is shown again."""
+    global _index
+    
+    items = list(items)
+    if _index is None or _index.items != items:
+        _index = Index(items)
+    return _index
+
+
+def _open_terminal():
+    """Attach stdin and stdout to the controlling terminal for curses.
+    
+    Returns a function that undoes it.
+    """
+    import sys
+    from .config import ConfigError
+    
+    if sys.stdin.isatty() and sys.stdout.isatty():
+        return lambda: None
+    try:
+        tty = os.open("/dev/tty", os.O_RDWR)
+    except OSError:
+        raise ConfigError("The builtin menu needs a terminal") from None
+    sys.stdout.flush()
+    saved = [os.dup(0), os.dup(1)]
+    os.dup2(tty, 0)
+    os.dup2(tty, 1)
+    os.close(tty)
+    
+    def restore():
+        for fd, copy in enumerate(saved):
+            os.dup2(copy, fd)
+            os.close(copy)
+    return restore
+
+
+def has_terminal():
+    """Whether the builtin menu could be shown."""
+    try:
+        os.close(os.open("/dev/tty", os.O_RDWR))
+    except OSError:
+        return False
+    return True
+
+
+def pick(items, prompt="Select", multi=False):
+    """Show items in the terminal and return the choice.
+    
+    Returns the highlighted item, or the typed text when nothing matches
+    (or on Alt+Enter); None if cancelled. With multi, Tab marks items and
+    a list is returned ([] if cancelled).
+    """
+    from . import trace
+    from .config import ConfigError
+    
+    try:
+        import curses
+    except ImportError:
+        raise ConfigError("The builtin menu needs Python's curses module") from None
+    
+    index = get_index(items)
+    os.environ.setdefault("ESCDELAY", "25")
+    restore = _open_terminal()
+    try:
+        with trace.span("menu", builtin=True, items=len(index.items), multi=multi):
+            result = curses.wrapper(_Picker(index, prompt, multi).run)
+    except curses.error as e:
+        raise ConfigError(f"The builtin menu cannot use this terminal: {e}") from None
+    finally:
+        restore()
+    if multi:
+        return result or []
+    return result
+
+
+class _Picker:
+    """Input loop and drawing for pick()."""
+    
+    def __init__(self, index, prompt, multi):
+        self.index = index
+        self.prompt = prompt
+        self.multi = multi
+        self.query = ""
+        self.search = index.search("")
+        self.cursor = 0
+        self.top = 0
+        self.marked = set()
+        self._page = 1
+    
+    def run(self, screen):
+        import curses
+        
+        screen.keypad(True)
+        while True:
+            self.search.run()
+            self._draw(screen)
+            # Keep scoring while no key is waiting
+            screen.timeout(-1 if self.search.done else 0)
+            try:
+                key = screen.get_wch()
+            except curses.error:
+                continue
+            if key == "\x1b":
+                # Alt+Enter returns the typed text, Escape alone cancels, and
+                # the rest of an unrecognized escape sequence is dropped
+                screen.timeout(int(os.environ["ESCDELAY"]))
+                try:
+                    following = screen.get_wch()
+                except curses.error:
+                    return None
+                if following in ("\n", "\r"):
+                    return [self.query] if self.multi else self.query
+                screen.timeout(0)
+                try:
+                    while True:
+                        screen.get_wch()
+                except curses.error:
+                    continue
+            done, result = self._handle(key, curses)
+            if done:
+                return result
+    
+    def _handle(self, key, curses):
+        """Apply one key; returns (finished, result)."""
+        rows = len(self.search)
+        if key in ("\n", "\r", curses.KEY_ENTER):
+            return True, self._result()
+        if key in ("\x03", "\x07"):  # Ctrl+C, Ctrl+G
+            return True, None
+        if key == "\t" and self.multi and rows:
+            self.marked ^= {self.search[self.cursor]}
+            self.cursor = min(self.cursor + 1, rows - 1)
+        elif key in (curses.KEY_UP, "\x10"):  # Ctrl+P
+            self.cursor = max(self.cursor - 1, 0)
+        elif key in (curses.KEY_DOWN, "\x0e"):  # Ctrl+N
+            self.cursor = min(self.cursor + 1, max(rows - 1, 0))
+        elif key == curses.KEY_PPAGE:
+            self.cursor = max(self.cursor - self._page, 0)
+        elif key == curses.KEY_NPAGE:
+            self.cursor = min(self.cursor + self._page, max(rows - 1, 0))
+        elif key in (curses.KEY_BACKSPACE, "\x7f", "\x08"):
+            self._set_query(self.query[:-1])
+        elif key == "\x15":  # Ctrl+U
+            self._set_query("")
+        elif key == "\x17":  # Ctrl+W
+            words = self.query.rstrip().rsplit(" ", 1)
+            self._set_query(words[0] + " " if len(words) > 1 else "")
+        elif isinstance(key, str) and key.isprintable():
+            self._set_query(self.query + key)
+        return False, None
+    
+    def _set_query(self, query):
+        self.query = query
+        self.search = self.index.search(query)
+        self.cursor = 0
+        self.top = 0
+    
+    def _result(self):
+        items = self.index.items
+        if self.multi and self.marked:
+            return [items[i] for i in sorted(self.marked)]
+        if len(self.search):
+            choice = items[self.search[self.cursor]]
+        else:
+            choice = self.query
+        if self.multi:
+            return [choice] if choice else []
+        return choice or None
+    
+    def _draw(self, screen):
+        import curses
+        
+        height, width = screen.getmaxyx()
+        self._page = max(height - 1, 1)
+        rows = len(self.search)
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + self._page:
+            self.top = self.cursor - self._page + 1
+        
+        screen.erase()
+        count = f" {rows}{'' if self.search.done else '+'}/{len(self.index.items)}"
+        header = f"{self.prompt}: {self.query}"
+        screen.addnstr(0, 0, header, max(width - len(count) - 1, 1))
+        if width > len(count) + len(header) + 1:
+            screen.addstr(0, width - len(count) - 1, count, curses.A_DIM)
+        for line in range(min(self._page, rows - self.top)):
+            i = self.search[self.top + line]
+            text = ("* " if i in self.marked else "  ") + self.index.items[i] if self.multi else self.index.items[i]
+            attr = curses.A_REVERSE if self.top + line == self.cursor else curses.A_NORMAL
+            screen.addnstr(line + 1, 0, text, width - 1, attr)
+        screen.move(0, min(len(header), width - 1))
+        screen.refresh()
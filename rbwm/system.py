@@ -1,13 +1,139 @@
 """System utilities for rbwm."""
+import os
 import subprocess
 import shutil
 
+# Every external tool rbwm may look up, probed together in one pass
+KNOWN_TOOLS = (
+    # Menus
+    "dmenu", "bemenu", "rofi", "wmenu", "fuzzel", "tofi",
+    # Pinentry
+    "pinentry-dmenu", "pinentry-curses", "pinentry-gnome3", "pinentry-qt", "pinentry",
+    # Clipboard and key injection
+    "wl-copy", "wl-paste", "wtype", "xclip", "xsel", "xdotool",
+    # Notifications and window titles
+    "notify-send", "hyprctl", "swaymsg",
+)
+
+_discovery = None
+
+
+class Task:
+    """A function call running on a daemon thread.
+    
+    A lighter stand-in for concurrent.futures, which costs more to import
+    than rbwm's whole startup path.
+    """
+    
+    def __init__(self, fn, *args):
+        import threading
+        
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(fn, args), daemon=True)
+        self._thread.start()
+    
+    def _run(self, fn, args):
+        try:
+            self._result = fn(*args)
+        except Exception as e:
+            self._error = e
+    
+    def done(self):
+        return not self._thread.is_alive()
+    
+    def result(self):
+        """Wait for the call and return its result, re-raising its exception."""
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def _fingerprint():
+    """Identify the display type and PATH (including its directories' mtimes)."""
+    parts = ["wayland" if os.environ.get("WAYLAND_DISPLAY") else "x11"]
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            mtime = 0
+        parts.append(f"{directory}:{mtime}")
+    return "\n".join(parts)
+
+
+def _discovery_file():
+    from .cache import get_dir
+    
+    return get_dir() / "tools.json"
+
+
+def _discover():
+    """Resolve KNOWN_TOOLS once per process.
+    
+    Results are persisted under a fingerprint of the display type and PATH,
+    so later runs only stat the PATH directories instead of probing.
+    """
+    global _discovery
+    if _discovery is not None:
+        return _discovery
+    
+    import json
+    
+    fingerprint = _fingerprint()
+    try:
+        stored = json.loads(_discovery_file().read_text())
+    except (OSError, ValueError):
+        stored = {}
+    
+    if stored.get("fingerprint") == fingerprint and not set(KNOWN_TOOLS) - stored.get("tools", {}).keys():
+        _discovery = stored
+    else:
+        # Probe in a few parallel batches
+        batches = [KNOWN_TOOLS[i::4] for i in range(4)]
+        tasks = [Task(lambda tools: [shutil.which(t) for t in tools], batch) for batch in batches]
+        paths = {}
+        for batch, task in zip(batches, tasks):
+            paths.update(zip(batch, task.result()))
+        _discovery = {
+            "fingerprint": fingerprint,
+            "tools": {tool: paths[tool] for tool in KNOWN_TOOLS},
+            "choices": {},
+        }
+        _save_discovery()
+    return _discovery
+
+
+def _save_discovery():
+    import json
+    
+    try:
+        _discovery_file().write_text(json.dumps(_discovery))
+    except OSError:
+        pass
+
 
 class System:
     @staticmethod
     def has_command(cmd: str) -> bool:
         """Check if command exists in PATH."""
-        return shutil.which(cmd) is not None
+        if not cmd:
+            return False
+        tools = _discover()["tools"]
+        if cmd not in tools:
+            tools[cmd] = shutil.which(cmd)
+        return tools[cmd] is not None
+    
+    @staticmethod
+    def recall(name):
+        """Get a choice remembered for the current display type and PATH."""
+        return _discover()["choices"].get(name)
+    
+    @staticmethod
+    def remember(name, value):
+        """Remember a choice (such as the injector backend) for the current display type and PATH."""
+        _discover()["choices"][name] = value
+        _save_discovery()
     
     @staticmethod
     def notify(message: str, title: str = "rbwm"):
@@ -17,3 +143,42 @@ class System:
                 ["notify-send", title, message], 
                 capture_output=True
             )
+    
+    @staticmethod
+    def in_background(fn, *args):
+        """Run fn(*args) on a background thread and return its Task."""
+        return Task(fn, *args)
+    
+    @staticmethod
+    def active_window_title() -> str:
+        """Get the focused window's title, or "" if it can't be determined."""
+        if os.environ.get("WAYLAND_DISPLAY"):
+            if System.has_command("hyprctl"):
+                import json
+                result = subprocess.run(["hyprctl", "activewindow", "-j"], capture_output=True, text=True)
+                try:
+                    return json.loads(result.stdout).get("title") or ""
+                except ValueError:
+                    return ""
+            if System.has_command("swaymsg"):
+                import json
+                result = subprocess.run(["swaymsg", "-t", "get_tree"], capture_output=True, text=True)
+                try:
+                    nodes = [json.loads(result.stdout)]
+                except ValueError:
+                    return ""
+                while nodes:
+                    node = nodes.pop()
+                    if node.get("focused"):
+                        return node.get("name") or ""
+                    nodes.extend(node.get("nodes", []) + node.get("floating_nodes", []))
+            return ""
+        
+        if System.has_command("xdotool"):
+            result = subprocess.run(
+                ["xdotool", "getactivewindow", "getwindowname"],
+                capture_output=True,
+                text=True
+            )
+            return result.stdout.strip()
+        return ""
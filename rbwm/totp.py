@@ -0,0 +1,89 @@
+"""
+RFC 6238 TOTP codes computed in-process from an entry's `totp` secret.
+
+Accepts a bare base32 secret, an otpauth://totp/ URI (secret, digits,
+period, algorithm SHA1/SHA256/SHA512) or a Bitwarden steam:// secret.
+"""
+import time
+
+# A code with less time than this left is not typed; the next one is awaited
+MIN_REMAINING = 2.0
+
+_STEAM_ALPHABET = "23456789BCDFGHJKMNPQRTVWXY"
+_ALGORITHMS = {"SHA1": "sha1", "SHA256": "sha256", "SHA512": "sha512"}
+
+
+def parse(secret):
+    """Parse a totp secret into {"key", "digits", "period", "algorithm", "steam"}.
+    
+    Raises ValueError for secrets that cannot be used.
+    """
+    import base64
+    
+    secret = (secret or "").strip()
+    params = {"digits": 6, "period": 30, "algorithm": "sha1", "steam": False}
+    if secret.lower().startswith("otpauth://"):
+        from urllib.parse import parse_qs, urlsplit
+        
+        uri = urlsplit(secret)
+        if uri.netloc.lower() != "totp":
+            raise ValueError(f"unsupported OTP type: {uri.netloc}")
+        query = {k.lower(): v[-1] for k, v in parse_qs(uri.query).items()}
+        secret = query.get("secret", "")
+        params["digits"] = int(query.get("digits", 6))
+        params["period"] = int(query.get("period", 30))
+        algorithm = query.get("algorithm", "SHA1").upper()
+        if algorithm not in _ALGORITHMS:
+            raise ValueError(f"unsupported TOTP algorithm: {algorithm}")
+        params["algorithm"] = _ALGORITHMS[algorithm]
+    elif secret.lower().startswith("steam://"):
+        secret = secret[len("steam://"):]
+        params["digits"] = 5
+        params["steam"] = True
+    
+    secret = "".join(secret.split()).replace("-", "").upper().rstrip("=")
+    if not secret or not 1 <= params["digits"] <= 10 or params["period"] < 1:
+        raise ValueError("invalid TOTP secret")
+    try:
+        params["key"] = base64.b32decode(secret + "=" * (-len(secret) % 8))
+    except ValueError:
+        raise ValueError("TOTP secret is not valid base32") from None
+    return params
+
+
+def code_at(params, now):
+    """The code for the time step containing `now`."""
+    import hashlib
+    import hmac
+    import struct
+    
+    counter = int(now // params["period"])
+    digest = hmac.new(params["key"], struct.pack(">Q", counter), getattr(hashlib, params["algorithm"])).digest()
+    offset = digest[-1] & 0x0F
+    value = struct.unpack(">I", digest[offset:offset + 4])[0] & 0x7FFFFFFF
+    if params["steam"]:
+        chars = []
+        for _ in range(params["digits"]):
+            value, index = divmod(value, len(_STEAM_ALPHABET))
+            chars.append(_STEAM_ALPHABET[index])
+        return "".join(chars)
+    return str(value % 10 ** params["digits"]).zfill(params["digits"])
+
+
+def remaining(params, now):
+    """Seconds until the code for `now` expires."""
+    return params["period"] - now % params["period"]
+
+
+def fresh_code(secret):
+    """The current code, waiting for the next one if it is about to expire.
+    
+    Call right before typing, so the code is still valid when it arrives.
+    """
+    params = parse(secret)
+    now = time.time()
+    left = remaining(params, now)
+    if left < MIN_REMAINING and params["period"] > MIN_REMAINING:
+        time.sleep(left)
+        now = time.time()
+    return code_at(params, now)
@@ -0,0 +1,166 @@
+"""
+Optional span tracing in Chrome trace format.
+
+Set RBWM_TRACE to a file path (or to 1 for ~/.cache/rbwm/trace-PID.json)
+and rbwm records every external command and its main phases as timed
+spans, written at exit. Open the file in chrome://tracing or Perfetto.
+
+When RBWM_TRACE is unset, span() hands out a shared no-op object and
+subprocess is left alone.
+"""
+import os
+import time
+
+ENABLED = bool(os.environ.get("RBWM_TRACE"))
+
+_events = []
+REDACTED = "<redacted>"
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def set(self, **args):
+        pass
+    
+    def end(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A timed span, ended explicitly or by leaving a with block."""
+    
+    def __init__(self, name, cat, args):
+        import threading
+        
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.tid = threading.get_ident()
+        self._start = time.perf_counter()
+        self._ended = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.end()
+        return False
+    
+    def set(self, **args):
+        self.args.update(args)
+    
+    def end(self, **args):
+        if self._ended:
+            return
+        self._ended = True
+        self.args.update(args)
+        _events.append({
+            "name": self.name,
+            "cat": self.cat,
+            "ph": "X",
+            "ts": (self._start - _origin) * 1e6,
+            "dur": (time.perf_counter() - self._start) * 1e6,
+            "pid": os.getpid(),
+            "tid": self.tid,
+            "args": self.args,
+        })
+
+
+def span(name, cat="phase", **args):
+    """Start a span for one phase of work; a no-op unless tracing is enabled."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, cat, args)
+
+
+def redact(args):
+    """Command line for a trace, without values that may be sensitive.
+    
+    Entry names and usernames given to rbw are dropped, as is quoted text
+    in shell commands (menu prompts can show the current field value).
+    Secrets themselves only ever travel over stdin and are never recorded.
+    """
+    if isinstance(args, (str, bytes)):
+        import re
+        
+        return re.sub(r"'[^']*'", f"'{REDACTED}'", os.fsdecode(args))
+    argv = [os.fsdecode(a) for a in args]
+    if argv and os.path.basename(argv[0]) == "rbw":
+        return " ".join(argv[:2] + [a if a.startswith("-") else REDACTED for a in argv[2:]])
+    return " ".join(argv)
+
+
+def _command_name(args):
+    command = args if isinstance(args, (str, bytes)) else args[0]
+    words = os.fsdecode(command).split()
+    return os.path.basename(words[0]) if words else "?"
+
+
+def _trace_file():
+    value = os.environ["RBWM_TRACE"]
+    if value != "1":
+        return value
+    from .cache import get_dir
+    
+    return str(get_dir() / f"trace-{os.getpid()}.json")
+
+
+def write():
+    """Write the recorded spans as a Chrome trace file."""
+    import json
+    
+    try:
+        with open(_trace_file(), "w") as f:
+            json.dump({"traceEvents": _events, "displayTimeUnit": "ms"}, f)
+    except OSError:
+        pass
+
+
+def _install():
+    """Trace every subprocess from start until its exit status is collected."""
+    import atexit
+    import subprocess
+    
+    class TracedPopen(subprocess.Popen):
+        def __init__(self, args, *a, **kw):
+            self._span = Span(_command_name(args), "subprocess", {"argv": redact(args)})
+            try:
+                super().__init__(args, *a, **kw)
+            except BaseException as e:
+                self._span.end(error=type(e).__name__)
+                raise
+            if kw.get("start_new_session"):
+                # Detached helpers are never waited for
+                self._span.end(detached=True)
+        
+        def _traced_exit(self):
+            if self.returncode is not None:
+                self._span.end(exit_code=self.returncode)
+        
+        def poll(self):
+            status = super().poll()
+            self._traced_exit()
+            return status
+        
+        def wait(self, timeout=None):
+            status = super().wait(timeout)
+            self._traced_exit()
+            return status
+    
+    subprocess.Popen = TracedPopen
+    atexit.register(write)
+
+
+_origin = time.perf_counter()
+if ENABLED:
+    _install()
@@ -0,0 +1,139 @@
+"""
+Frecency usage store for ranking entries.
+
+Usage lives in a small fixed-record binary file: one 32-byte record per
+entry holding a 16-byte key (the entry's UUID), a decaying score and
+the time it was last used.
+"""
+import os
+import struct
+import time
+from pathlib import Path
+
+HALF_LIFE = 7 * 24 * 3600
+MAX_RECORDS = 256
+# Highest scores rank() orders; about a menu's first screen and then some
+RANKED = 32
+RECORD = struct.Struct("<16sdd")
+
+
+def get_dir() -> Path:
+    """Get state directory, creating if needed."""
+    base = os.environ.get('XDG_STATE_HOME', Path.home() / '.local' / 'state')
+    path = Path(base) / "rbwm"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def usage_file() -> Path:
+    return get_dir() / "usage.bin"
+
+
+def entry_key(entry) -> bytes:
+    """Stable 16-byte key for an entry: its UUID, or a hash of other IDs."""
+    try:
+        key = bytes.fromhex(entry.id.replace("-", ""))
+    except ValueError:
+        key = b""
+    if len(key) == 16:
+        return key
+    
+    import hashlib
+    
+    ident = entry.id or f"{entry.name}\0{entry.user}"
+    return hashlib.blake2b(ident.encode(), digest_size=16).digest()
+
+
+def _decayed(score, last_used, now):
+    return score * 0.5 ** (max(0.0, now - last_used) / HALF_LIFE)
+
+
+def _read():
+    """Read raw records as {key: (score, last_used)}."""
+    try:
+        data = usage_file().read_bytes()
+    except OSError:
+        return {}
+    data = data[:len(data) - len(data) % RECORD.size]
+    return {key: (score, last) for key, score, last in RECORD.iter_unpack(data)}
+
+
+def _write(records):
+    """Atomically write records, keeping the MAX_RECORDS highest scores."""
+    now = time.time()
+    keep = sorted(records.items(), key=lambda r: _decayed(*r[1], now), reverse=True)[:MAX_RECORDS]
+    path = usage_file()
+    tmp = path.with_suffix(".tmp")
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"".join(RECORD.pack(key, score, last) for key, (score, last) in keep))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def load_scores():
+    """Get current (decayed) scores as {key: score}."""
+    now = time.time()
+    return {key: _decayed(score, last, now) for key, (score, last) in _read().items()}
+
+
+def record(entry):
+    """Count one use of an entry."""
+    now = time.time()
+    records = _read()
+    key = entry_key(entry)
+    score, last = records.get(key, (0.0, now))
+    records[key] = (_decayed(score, last, now) + 1.0, now)
+    _write(records)
+
+
+def prune(entries):
+    """Forget entries that are no longer in the vault."""
+    records = _read()
+    live = {entry_key(entry) for entry in entries}
+    if records.keys() - live:
+        _write({key: value for key, value in records.items() if key in live})
+
+
+def top(entries, n, scores=None):
+    """The n most frecent of the given entries."""
+    scores = load_scores() if scores is None else scores
+    scored = [e for e in entries if entry_key(e) in scores]
+    scored.sort(key=lambda e: scores[entry_key(e)], reverse=True)
+    return scored[:n]
+
+
+def rank(entries, scores=None, limit=RANKED):
+    """Yield entries most frecent first, streaming the rest.
+    
+    Only the `limit` highest scores are ranked: those entries are held
+    back, together with whatever arrives before the last of them, until
+    each has been seen or the input ends. After that, entries (lower
+    scored ones included) pass straight through.
+    """
+    scores = load_scores() if scores is None else scores
+    pending = set(sorted(scores, key=scores.get, reverse=True)[:limit])
+    ranked = []
+    held = []
+    for entry in entries:
+        if not pending:
+            yield entry
+            continue
+        key = entry_key(entry)
+        if key in pending:
+            ranked.append((scores[key], entry))
+            pending.discard(key)
+        else:
+            held.append(entry)
+        if not pending:
+            ranked.sort(key=lambda r: r[0], reverse=True)
+            yield from (entry for _, entry in ranked)
+            yield from held
+    
+    if pending:
+        # Some scored entries were not in the listing
+        ranked.sort(key=lambda r: r[0], reverse=True)
+        yield from (entry for _, entry in ranked)
+        yield from held
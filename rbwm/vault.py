@@ -2,6 +2,14 @@
 import subprocess
 import json
 
+from . import trace
+
+PREFETCH_LIMIT = 3
+
+# (name, user, id) -> Task fetching get_entry_data results ahead of time.
+# Secrets live only in memory and are dropped by clear_prefetched().
+_prefetched = {}
+
 
 def is_unlocked() -> bool:
     """Check if vault is unlocked."""
@@ -18,7 +26,8 @@ def unlock() -> bool:
     env = os.environ.copy()
     env["PINENTRY_PROGRAM"] = pinentry_cmd
     
-    result = subprocess.run(["rbw", "unlock"], env=env)
+    with trace.span("unlock"):
+        result = subprocess.run(["rbw", "unlock"], env=env)
     return result.returncode == 0
 
 
@@ -36,43 +45,253 @@ def lock():
 
 def sync():
     """Sync with Bitwarden servers."""
+    from . import cache
+    
     subprocess.run(["rbw", "sync"], capture_output=True)
+    cache.invalidate()
+
+
+def _build_entries(output):
+    """Turn `rbw list --raw` output into an EntryTable."""
+    from .entries import Entry, EntryTable
+    
+    output = output.strip()
+    return EntryTable(Entry.from_item(item) for item in (json.loads(output) if output else []))
+
+
+def _load_cached(stamp):
+    """Get the cached EntryTable for this database stamp, or None."""
+    from . import cache
+    from .entries import EntryTable
+    
+    cached = cache.load_entries(stamp)
+    return EntryTable.from_dicts(cached) if cached is not None else None
+
+
+class _JsonArray:
+    """Elements of a JSON array of objects, parsed as they arrive on a binary stream.
+    
+    The decoder and its buffered text live on the object, so iteration can
+    stop and resume later without losing anything. `complete` is set once
+    the closing bracket has been read.
+    """
+    
+    def __init__(self, stream, chunk_size=65536):
+        import codecs
+        
+        self.complete = False
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        while True:
+            buf, pos = self._buf, self._pos
+            # Skip the array brackets, separators and whitespace between elements
+            while pos < len(buf) and buf[pos] in "[], \t\r\n":
+                if buf[pos] == "]":
+                    self.complete = True
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                try:
+                    item, self._pos = self._decoder.raw_decode(buf, pos)
+                    return item
+                except json.JSONDecodeError:
+                    pass  # Element not complete yet
+            if self._eof:
+                raise StopIteration  # Done, or truncated output
+            chunk = self._stream.read1(self._chunk_size)
+            self._eof = not chunk
+            self._buf = buf[self._pos:] + self._utf8.decode(chunk, final=self._eof)
+            self._pos = 0
+
+
+def _iter_json_array(stream, chunk_size=65536):
+    """Iterate over the elements of a JSON array of objects as they arrive on a binary stream."""
+    return _JsonArray(stream, chunk_size)
 
 
 def get_entries():
-    """Get all vault entries."""
-    result = subprocess.run(["rbw", "list", "--raw"], capture_output=True, text=True)
-    output = result.stdout.strip()
-    all_entries = json.loads(output) if output else []
-    
-    entries = []
-    for item in all_entries:
-        name = item.get("name", "")
-        user = item.get("user", "")
-        folder = item.get("folder", "")
-        entry_type = item.get("type", "")
-        display = name
-        if user:
-            display += f" ({user})"
-        if folder:
-            display += f" [{folder}]"
-        entries.append({
-            "display": display,
-            "name": name,
-            "user": user,
-            "folder": folder,
-            "type": entry_type
-        })
-    return entries
-
-
-def get_entry_data(name):
-    """Get full data for an entry."""
-    result = subprocess.run(
-        ["rbw", "get", "--raw", name],
-        capture_output=True,
-        text=True
-    )
+    """Get all vault entries, from the listing cache while rbw's database is unchanged."""
+    from . import cache
+    
+    with trace.span("list") as span:
+        stamp = cache.rbw_db_stamp()
+        entries = _load_cached(stamp)
+        span.set(cached=entries is not None)
+        if entries is not None:
+            return entries
+        
+        result = subprocess.run(["rbw", "list", "--raw"], capture_output=True, text=True)
+        entries = _build_entries(result.stdout)
+        
+        if result.returncode == 0:
+            cache.store_entries(stamp, entries.to_dicts())
+        return entries
+
+
+class Listing:
+    """Vault listing started in the background.
+    
+    `rbw unlocked` starts right away, overlapping the cache read and the
+    opening of the menu. `rbw list` only runs once the vault is known to
+    be unlocked and the cache missed, so rbw never asks for the master
+    password on its own behind an open menu; its JSON is parsed as it
+    streams in.
+    """
+    
+    def __init__(self):
+        from . import cache
+        
+        self._span = trace.span("list")
+        self._check = subprocess.Popen(
+            ["rbw", "unlocked"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self._stamp = cache.rbw_db_stamp()
+        self._entries = _load_cached(self._stamp)
+        self._cached = self._entries is not None
+        self._locked = None
+        self._proc = None
+        self._items = None
+    
+    @classmethod
+    def finished(cls, entries):
+        """A listing whose outcome is already known (an EntryTable, or None for a locked vault)."""
+        listing = cls.__new__(cls)
+        listing._check = None
+        listing._proc = None
+        listing._items = None
+        listing._cached = True
+        listing._entries = entries
+        listing._locked = entries is None
+        return listing
+    
+    def _start(self):
+        """Wait for the unlock check and start `rbw list` if the cache missed."""
+        from .entries import EntryTable
+        
+        unlocked = self._check.wait() == 0
+        self._check = None
+        if unlocked and not self._cached:
+            self._entries = EntryTable()
+            self._proc = subprocess.Popen(
+                ["rbw", "list", "--raw"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+            self._items = _iter_json_array(self._proc.stdout)
+        else:
+            self._locked = not unlocked
+            self._span.end(cached=self._cached, locked=self._locked, entries=len(self._entries or ()))
+    
+    def stream(self):
+        """Yield entries as they become available.
+        
+        A stream abandoned part way (say, the menu closed early) resumes
+        where it stopped on the next call to stream() or result().
+        """
+        from . import cache
+        from .entries import Entry
+        
+        if self._check is not None:
+            self._start()
+        if self._items is None or self._locked is not None:
+            yield from ([] if self._locked else self._entries or [])
+            return
+        
+        # A plain for loop: closing this generator must not close the parser
+        for item in self._items:
+            yield self._entries.add(Entry.from_item(item))
+        
+        if self._locked is None:
+            self._proc.stdout.read()
+            self._proc.stdout.close()
+            self._locked = self._proc.wait() != 0
+            if not self._locked and self._items.complete:
+                cache.store_entries(self._stamp, self._entries.to_dicts())
+            self._span.end(cached=False, locked=self._locked, complete=self._items.complete,
+                           entries=len(self._entries))
+    
+    def cached(self):
+        """The listing read from the cache, without waiting; None on a cache miss."""
+        return self._entries if self._cached else None
+    
+    def result(self):
+        """Wait for the listing; returns the EntryTable, or None if the vault is locked."""
+        for _ in self.stream():
+            pass
+        return None if self._locked else self._entries
+
+
+def prefetch(entries):
+    """Start fetching data for likely selections while the menu is open."""
+    import atexit
+    from .system import System
+    
+    if not _prefetched:
+        atexit.register(clear_prefetched)
+    for entry in entries:
+        if len(_prefetched) >= PREFETCH_LIMIT:
+            break
+        key = (entry.name, entry.user, entry.id)
+        if key not in _prefetched:
+            _prefetched[key] = System.in_background(_fetch_entry_data, entry.name, entry.user, entry.id)
+
+
+def clear_prefetched():
+    """Drop all prefetched entry data."""
+    for task in _prefetched.values():
+        if task.done():
+            try:
+                task.result().clear()
+            except Exception:
+                pass
+    _prefetched.clear()
+
+
+def _needle(name, user="", id=""):
+    """rbw arguments naming one entry.
+    
+    The entry's ID picks it even among entries sharing a name and username
+    (in different folders, or not); without one, the username narrows it.
+    """
+    if id:
+        return [id]
+    return [name] + ([user] if user else [])
+
+
+def get_entry_data(name, user="", id=""):
+    """Get full data for an entry (the ID, else the username, disambiguates same-named entries)."""
+    task = _prefetched.pop((name, user, id), None)
+    if task is not None:
+        try:
+            data = task.result()
+        except Exception:
+            data = None
+        if data:
+            return data
+    return _fetch_entry_data(name, user, id)
+
+
+def _fetch_entry_data(name, user="", id=""):
+    """Run `rbw get --raw` for an entry."""
+    cmd = ["rbw", "get", "--raw"] + _needle(name, user, id)
+    with trace.span("fetch"):
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True
+        )
     output = result.stdout.strip()
     if not output:
         return {}
@@ -82,41 +301,114 @@ def get_entry_data(name):
         return {}
 
 
-def get_entry_fields(entry_name):
-    """Get displayable fields for an entry."""
-    data = get_entry_data(entry_name)
-    entry_data = data.get("data", {})
-    if not entry_data:
-        return []
-    
-    fields = []
+# Fields whose values the Details menu previews, besides URIs and text
+# custom fields; every other field (card numbers and codes, SSNs, passport
+# and license numbers, ...) is listed by name only
+PREVIEW_FIELDS = {"username", "brand", "exp_month", "exp_year"}
+
+
+def _label(name, value, preview):
+    """Menu label for a field: its name, plus a short preview if allowed."""
+    if not preview or not isinstance(value, str):
+        return name
+    return f"{name}: {value[:50]}..." if len(value) > 50 else f"{name}: {value}"
+
+
+def get_entry_fields(entry_name, user="", id=""):
+    """Get the fields of an entry as menu labels, without their values.
     
-    for key, value in entry_data.items():
-        if value is None or value == "" or value == []:
-            continue
-        
-        if key == "password":
-            fields.append({"display": "password", "value": value})
+    Returns a list of fields, each with a "display" label and a "key" for
+    resolve_field(). Labels only preview the values of PREVIEW_FIELDS,
+    URIs and text custom fields; the record they were read from is
+    dropped before returning.
+    """
+    data = get_entry_data(entry_name, user, id)
+    try:
+        entry_data = data.get("data") or {}
+        candidates = []
         
-        elif key == "totp":
-            result = subprocess.run(
-                ["rbw", "code", entry_name],
-                capture_output=True,
-                text=True
-            )
-            totp = result.stdout.strip()
-            if totp:
-                fields.append({"display": "totp", "value": totp})
+        for key, value in entry_data.items():
+            if key == "uris":
+                for i, uri in enumerate(value or []):
+                    uri = uri.get("uri") if isinstance(uri, dict) else uri
+                    if uri:
+                        candidates.append((_label("uri", uri, True), ("uri", i)))
+            elif isinstance(value, str) and value:
+                candidates.append((_label(key, value, key in PREVIEW_FIELDS), ("data", key)))
         
-        elif isinstance(value, str):
-            display = f"{key}: {value[:50]}..." if len(value) > 50 else f"{key}: {value}"
-            fields.append({"display": display, "value": value})
+        if data.get("notes"):
+            candidates.append(("notes", ("notes",)))
+        for i, field in enumerate(data.get("fields") or []):
+            if field.get("value"):
+                name = field.get("name") or f"field {i + 1}"
+                text = str(field.get("type", "text")).lower() in ("text", "0")
+                candidates.append((_label(name, field["value"], text), ("field", i)))
+    finally:
+        data.clear()
     
+    fields = []
+    seen = set()
+    for display, key in candidates:
+        label = display
+        n = 1
+        while label in seen:
+            n += 1
+            label = f"{display} ({n})"
+        seen.add(label)
+        fields.append({"display": label, "key": key})
     return fields
 
 
+def resolve_field(field, entry_name, user="", id=""):
+    """Fetch the value of one field from get_entry_fields(), generating TOTP codes on demand."""
+    data = _fetch_entry_data(entry_name, user, id)
+    try:
+        kind, *rest = field["key"]
+        if kind == "data":
+            value = (data.get("data") or {}).get(rest[0]) or ""
+            if rest[0] == "totp":
+                return get_totp_code(value, entry_name, user, id)
+            return value
+        if kind == "uri":
+            uris = (data.get("data") or {}).get("uris") or []
+            uri = uris[rest[0]] if rest[0] < len(uris) else ""
+            return (uri.get("uri") if isinstance(uri, dict) else uri) or ""
+        if kind == "notes":
+            return data.get("notes") or ""
+        fields = data.get("fields") or []
+        return (fields[rest[0]].get("value") if rest[0] < len(fields) else "") or ""
+    finally:
+        data.clear()
+
+
+def get_totp_code(secret, name, user="", id=""):
+    """Current TOTP code for a secret, computed locally where possible."""
+    from . import totp
+    
+    try:
+        return totp.fresh_code(secret)
+    except ValueError:
+        pass
+    # Secret format rbwm doesn't handle; let rbw try
+    result = subprocess.run(
+        ["rbw", "code"] + _needle(name, user, id),
+        capture_output=True,
+        text=True
+    )
+    return result.stdout.strip()
+
+
 def add_entry(name, username="", password="", uri="", folder="", notes=""):
     """Add a new entry to the vault."""
+    from . import cache
+    
+    result = run_add(name, username, password, [uri] if uri else [], folder, notes)
+    cache.invalidate()
+    return result.returncode == 0
+
+
+def run_add(name, username="", password="", uris=(), folder="", notes=""):
+    """Run `rbw add` and return the CompletedProcess; the caller invalidates the cache."""
     add_input = password
     if notes:
         add_input += "\n" + notes
@@ -126,36 +418,119 @@ def add_entry(name, username="", password="", uri="", folder="", notes=""):
         cmd.append(username)
     if folder:
         cmd.extend(["--folder", folder])
-    if uri:
+    for uri in uris:
         cmd.extend(["--uri", uri])
     
-    result = subprocess.run(cmd, input=add_input, text=True, capture_output=True)
-    return result.returncode == 0
+    return subprocess.run(cmd, input=add_input, text=True, capture_output=True)
 
 
-def remove_entry(name):
+def remove_entry(name, user="", id=""):
     """Remove an entry from the vault."""
-    result = subprocess.run(["rbw", "remove", name], capture_output=True)
+    from . import cache
+    
+    result = subprocess.run(["rbw", "remove"] + _needle(name, user, id), capture_output=True)
+    cache.invalidate()
     return result.returncode == 0
 
 
-def edit_entry(name, username="", password="", uri="", folder="", notes=""):
-    """Edit an entry (rbw doesn't support direct edit, so remove and recreate)."""
-    # Remove old entry
-    subprocess.run(["rbw", "remove", name], capture_output=True)
+# Fields `rbw edit` can change in place; changing any other recreates the entry
+EDIT_IN_PLACE = {"password", "notes"}
+
+
+def lost_on_recreate(data):
+    """What recreating an entry from its get_entry_data() would drop, for a warning."""
+    entry_data = data.get("data") or {}
+    lost = []
+    if entry_data.get("totp"):
+        lost.append("TOTP secret")
+    if data.get("fields"):
+        lost.append(f"{len(data['fields'])} custom field(s)")
+    if len(entry_data.get("uris") or []) > 1:
+        lost.append(f"{len(entry_data['uris']) - 1} extra URI(s)")
+    return lost
+
+
+def edit_entry(name, user="", current=None, id="", **changes):
+    """Apply changed fields to an entry; returns None, or a message saying what failed.
     
-    # Recreate with new values
-    add_input = password
-    if notes:
-        add_input += "\n" + notes
+    `current` holds the entry's username, password, uri, folder and notes,
+    `changes` only the fields that differ. Password and notes are rewritten
+    in place by a single `rbw edit`, which keeps TOTP secrets, custom fields
+    and extra URIs. rbw cannot edit the username, URI or folder, so changes
+    to those add the entry anew and then remove the old one by its ID,
+    which is kept if the add fails; see lost_on_recreate(). Without an ID
+    the old entry could not be told from the new one, so nothing is done.
+    """
+    from . import cache
     
-    cmd = ["rbw", "add", name]
-    if username:
-        cmd.append(username)
-    if folder:
-        cmd.extend(["--folder", folder])
-    if uri:
-        cmd.extend(["--uri", uri])
+    if not changes:
+        return None
+    fields = dict(current or {}, **changes)
+    if changes.keys() - EDIT_IN_PLACE:
+        if not id:
+            return f"Cannot recreate {name}: rbw did not list its ID"
+        if not add_entry(
+            name,
+            fields.get("username", ""),
+            fields.get("password", ""),
+            fields.get("uri", ""),
+            fields.get("folder", ""),
+            fields.get("notes", "")
+        ):
+            return f"Could not save {name}; the entry is unchanged"
+        if not remove_entry(name, user, id):
+            return f"Saved {name} as a new entry, but the old one could not be removed"
+        return None
     
-    result = subprocess.run(cmd, input=add_input, text=True, capture_output=True)
-    return result.returncode == 0
+    # rbw's edit buffer: the password on the first line, then the notes
+    contents = fields.get("password", "") + "\n"
+    if fields.get("notes"):
+        contents += "\n" + fields["notes"] + "\n"
+    
+    result = _run_with_editor(["rbw", "edit"] + _needle(name, user, id), contents)
+    cache.invalidate()
+    return None if result == 0 else f"Could not save {name}: rbw edit failed"
+
+
+def _run_with_editor(cmd, contents):
+    """Run cmd with rbwm's editor script as EDITOR, feeding it contents over a pipe.
+    
+    rbw releases that read a non-terminal stdin instead of starting the
+    editor get the same contents on stdin.
+    """
+    import os
+    import shlex
+    import sys
+    from . import editor
+    from .system import System
+    
+    read_fd, write_fd = os.pipe()
+    env = os.environ.copy()
+    env["EDITOR"] = env["VISUAL"] = shlex.join([sys.executable, editor.__file__, str(read_fd)])
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            env=env,
+            pass_fds=(read_fd,),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+    except OSError:
+        os.close(write_fd)
+        raise
+    finally:
+        os.close(read_fd)
+    
+    def feed(pipe):
+        try:
+            with pipe:
+                pipe.write(contents.encode())
+        except BrokenPipeError:
+            pass  # rbw took its input from the other pipe, or exited
+    
+    # rbw reads only one of the two pipes, so neither write may block the other
+    stdin_task = System.in_background(feed, proc.stdin)
+    feed(os.fdopen(write_fd, "wb"))
+    stdin_task.result()
+    return proc.wait()
@@ -0,0 +1,264 @@
+"""
+In-process X11 injection through libX11/libXtst via ctypes.
+
+The selection is owned by rbwm itself and key events are synthesized with
+XTest, so a paste costs no fork/exec. Selection requests are answered until
+the target application has read the pasted text.
+
+Opt-in (XTEST_INJECTOR=true), since it has limits the xclip/xsel backends
+don't: INCR transfers are not implemented, so clipboard contents larger
+than one X request read back empty and are not restored, and a paste
+blocks for up to PASTE_TIMEOUT when the application never asks for the
+selection.
+"""
+import ctypes
+import os
+import time
+
+from .inject import Injector
+from .system import System
+
+PASTE_TIMEOUT = 1.0
+READ_TIMEOUT = 0.5
+
+# X protocol constants
+_SELECTION_REQUEST = 30
+_SELECTION_NOTIFY = 31
+_XA_ATOM = 4
+_PROP_MODE_REPLACE = 0
+_CURRENT_TIME = 0
+_ANY_PROPERTY_TYPE = 0
+
+_Atom = ctypes.c_ulong
+_Window = ctypes.c_ulong
+
+
+class _XSelectionRequestEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("owner", _Window),
+        ("requestor", _Window),
+        ("selection", _Atom),
+        ("target", _Atom),
+        ("property", _Atom),
+        ("time", ctypes.c_ulong),
+    ]
+
+
+class _XSelectionEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("serial", ctypes.c_ulong),
+        ("send_event", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("requestor", _Window),
+        ("selection", _Atom),
+        ("target", _Atom),
+        ("property", _Atom),
+        ("time", ctypes.c_ulong),
+    ]
+
+
+class _XEvent(ctypes.Union):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("xselectionrequest", _XSelectionRequestEvent),
+        ("xselection", _XSelectionEvent),
+        ("pad", ctypes.c_long * 24),
+    ]
+
+
+_libs = None
+
+
+def _load():
+    """Load and prototype libX11 and libXtst, or return None if missing."""
+    global _libs
+    if _libs is None:
+        try:
+            x11 = ctypes.CDLL("libX11.so.6")
+            xtst = ctypes.CDLL("libXtst.so.6")
+        except OSError:
+            _libs = False
+            return None
+        
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XDefaultRootWindow.restype = _Window
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x11.XCreateSimpleWindow.restype = _Window
+        x11.XCreateSimpleWindow.argtypes = [
+            ctypes.c_void_p, _Window, ctypes.c_int, ctypes.c_int, ctypes.c_uint,
+            ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_ulong,
+        ]
+        x11.XInternAtom.restype = _Atom
+        x11.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        x11.XSetSelectionOwner.argtypes = [ctypes.c_void_p, _Atom, _Window, ctypes.c_ulong]
+        x11.XConvertSelection.argtypes = [ctypes.c_void_p, _Atom, _Atom, _Atom, _Window, ctypes.c_ulong]
+        x11.XPending.argtypes = [ctypes.c_void_p]
+        x11.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XEvent)]
+        x11.XCheckTypedWindowEvent.argtypes = [ctypes.c_void_p, _Window, ctypes.c_int, ctypes.POINTER(_XEvent)]
+        x11.XChangeProperty.argtypes = [
+            ctypes.c_void_p, _Window, _Atom, _Atom, ctypes.c_int, ctypes.c_int,
+            ctypes.c_void_p, ctypes.c_int,
+        ]
+        x11.XGetWindowProperty.argtypes = [
+            ctypes.c_void_p, _Window, _Atom, ctypes.c_long, ctypes.c_long, ctypes.c_int, _Atom,
+            ctypes.POINTER(_Atom), ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_ulong),
+            ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_void_p),
+        ]
+        x11.XSendEvent.argtypes = [ctypes.c_void_p, _Window, ctypes.c_int, ctypes.c_long, ctypes.POINTER(_XEvent)]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XFlush.argtypes = [ctypes.c_void_p]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XStringToKeysym.restype = ctypes.c_ulong
+        x11.XStringToKeysym.argtypes = [ctypes.c_char_p]
+        x11.XKeysymToKeycode.restype = ctypes.c_ubyte
+        x11.XKeysymToKeycode.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        xtst.XTestFakeKeyEvent.argtypes = [ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_ulong]
+        _libs = (x11, xtst)
+    return _libs or None
+
+
+class XTestInjector(Injector):
+    name = "xtest"
+    display = "x11"
+    selections = ["PRIMARY", "CLIPBOARD"]
+    can_chord = can_batch = confirms_paste = True
+    
+    @classmethod
+    def available(cls):
+        return bool(os.environ.get("DISPLAY")) and _load() is not None
+    
+    def __init__(self):
+        self._x11, self._xtst = _load()
+        self._dpy = self._x11.XOpenDisplay(None)
+        if not self._dpy:
+            raise OSError("cannot open X display")
+        root = self._x11.XDefaultRootWindow(self._dpy)
+        self._window = self._x11.XCreateSimpleWindow(self._dpy, root, 0, 0, 1, 1, 0, 0, 0)
+        self._owned = {}  # selection atom -> bytes served to requestors
+        self._utf8 = self._atom("UTF8_STRING")
+        self._text_targets = {self._utf8, self._atom("STRING"), self._atom("TEXT"),
+                              self._atom("text/plain;charset=utf-8"), self._atom("text/plain")}
+        self._targets = self._atom("TARGETS")
+    
+    def _atom(self, name):
+        return self._x11.XInternAtom(self._dpy, name.encode(), False)
+    
+    def read_selection(self, selection):
+        x11 = self._x11
+        prop = self._atom("RBWM_SELECTION")
+        x11.XConvertSelection(self._dpy, self._atom(selection), self._utf8, prop, self._window, _CURRENT_TIME)
+        x11.XFlush(self._dpy)
+        
+        event = _XEvent()
+        deadline = time.monotonic() + READ_TIMEOUT
+        while not x11.XCheckTypedWindowEvent(self._dpy, self._window, _SELECTION_NOTIFY, ctypes.byref(event)):
+            if time.monotonic() > deadline:
+                return ""
+            time.sleep(0.005)
+        if not event.xselection.property:
+            return ""
+        
+        actual_type = _Atom()
+        actual_format = ctypes.c_int()
+        nitems = ctypes.c_ulong()
+        remaining = ctypes.c_ulong()
+        data = ctypes.c_void_p()
+        x11.XGetWindowProperty(
+            self._dpy, self._window, prop, 0, 1 << 24, True, _ANY_PROPERTY_TYPE,
+            ctypes.byref(actual_type), ctypes.byref(actual_format), ctypes.byref(nitems),
+            ctypes.byref(remaining), ctypes.byref(data),
+        )
+        if not data.value:
+            return ""
+        try:
+            if actual_format.value != 8:
+                return ""  # INCR transfers and non-text data are not supported
+            return ctypes.string_at(data.value, nitems.value).decode("utf-8", "replace")
+        finally:
+            x11.XFree(data)
+    
+    def write_selection(self, selection, text):
+        atom = self._atom(selection)
+        self._owned[atom] = text.encode()
+        self._x11.XSetSelectionOwner(self._dpy, atom, self._window, _CURRENT_TIME)
+        self._x11.XFlush(self._dpy)
+    
+    def write_command(self, selection):
+        # Restoration outlives this process, so it goes through a clipboard tool
+        if System.has_command("xclip"):
+            return ["xclip", "-selection", selection.lower()]
+        return ["xsel", "-p" if selection == "PRIMARY" else "-b", "-i"]
+    
+    def restore_later(self, selection, text, delay):
+        if System.has_command("xclip") or System.has_command("xsel"):
+            super().restore_later(selection, text, delay)
+    
+    def _keycode(self, keysym_name):
+        keysym = self._x11.XStringToKeysym(keysym_name.encode())
+        return self._x11.XKeysymToKeycode(self._dpy, keysym) if keysym else 0
+    
+    def _chord(self, chord):
+        """Press and release a chord like "shift+Insert"."""
+        names = ["Shift_L" if n.lower() == "shift" else n for n in chord.split("+")]
+        codes = [self._keycode(name) for name in names]
+        if not all(codes):
+            return
+        for code in codes:
+            self._xtst.XTestFakeKeyEvent(self._dpy, code, True, 0)
+        for code in reversed(codes):
+            self._xtst.XTestFakeKeyEvent(self._dpy, code, False, 0)
+    
+    def _serve(self, request):
+        """Answer one SelectionRequest; returns True if text was handed over."""
+        x11 = self._x11
+        data = self._owned.get(request.selection)
+        prop = request.property or request.target
+        delivered = False
+        if data is None:
+            prop = 0
+        elif request.target == self._targets:
+            atoms = (_Atom * (len(self._text_targets) + 1))(self._targets, *self._text_targets)
+            x11.XChangeProperty(self._dpy, request.requestor, prop, _XA_ATOM, 32,
+                                _PROP_MODE_REPLACE, atoms, len(atoms))
+        elif request.target in self._text_targets:
+            x11.XChangeProperty(self._dpy, request.requestor, prop, request.target, 8,
+                                _PROP_MODE_REPLACE, data, len(data))
+            delivered = True
+        else:
+            prop = 0
+        
+        reply = _XEvent()
+        reply.xselection.type = _SELECTION_NOTIFY
+        reply.xselection.display = self._dpy
+        reply.xselection.requestor = request.requestor
+        reply.xselection.selection = request.selection
+        reply.xselection.target = request.target
+        reply.xselection.property = prop
+        reply.xselection.time = request.time
+        x11.XSendEvent(self._dpy, request.requestor, False, 0, ctypes.byref(reply))
+        x11.XFlush(self._dpy)
+        return delivered
+    
+    def send_keys(self, keys, paste=False):
+        if paste:
+            self._chord("shift+Insert")
+            self._x11.XFlush(self._dpy)
+            # Keep serving the selection until the paste has been read
+            event = _XEvent()
+            deadline = time.monotonic() + PASTE_TIMEOUT
+            while time.monotonic() < deadline:
+                if not self._x11.XPending(self._dpy):
+                    time.sleep(0.002)
+                    continue
+                self._x11.XNextEvent(self._dpy, ctypes.byref(event))
+                if event.type == _SELECTION_REQUEST and self._serve(event.xselectionrequest):
+                    break
+        for key in keys:
+            self._chord(key)
+        self._x11.XSync(self._dpy, False)